@@ -0,0 +1,151 @@
+"""
+Job manifest for incremental batches.
+
+The manifest is a small JSON file kept in the output folder. For every output
+it records the source file (size, mtime and optionally a content hash), the
+settings used and the output file that was written, or that the output was
+skipped on purpose (e.g. by the upscale policy). A later run with the same
+settings skips sources that have not changed since, and a batch that was
+interrupted picks up where it stopped because finished outputs are saved as
+the batch goes.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = '.image_resizer_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Outputs already produced, keyed by output path.
+
+    With use_hash=True a source whose size or mtime changed is hashed before
+    being reprocessed, so files that were only touched or copied are still
+    skipped.
+    """
+
+    def __init__(self, path, use_hash=False, save_interval=5.0):
+        self.path = path
+        self.use_hash = use_hash
+        self.save_interval = save_interval
+        self.entries = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def for_output(cls, output_location, single_file=False, **kwargs):
+        """Manifest kept in the output folder (or next to a single output file)"""
+        folder = os.path.dirname(output_location) if single_file else output_location
+        return cls(os.path.join(folder or '.', MANIFEST_NAME), **kwargs)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.entries = data.get('outputs', {})
+
+    @staticmethod
+    def fingerprint(input_path):
+        """Cheap identity of the source file contents"""
+        stat = os.stat(input_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def is_current(self, input_path, output_path, settings_key, fingerprint):
+        """Check whether output_path is already up to date for this source and settings"""
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(output_path))
+        if entry is None or entry['settings'] != settings_key:
+            return False
+        if entry['input'] != os.path.abspath(input_path):
+            return False
+
+        # The output must still be the file we wrote; skipped outputs have none
+        if entry.get('action') != 'skip':
+            try:
+                output_stat = os.stat(output_path)
+            except OSError:
+                return False
+            if (output_stat.st_size, output_stat.st_mtime_ns) != (entry['output_size'], entry['output_mtime_ns']):
+                return False
+
+        if fingerprint['size'] == entry['size'] and fingerprint['mtime_ns'] == entry['mtime_ns']:
+            return True
+        if not self.use_hash or fingerprint['size'] != entry['size'] or 'sha256' not in entry:
+            return False
+
+        # Touched or copied but maybe not changed: compare contents
+        fingerprint['sha256'] = file_sha256(input_path)
+        if fingerprint['sha256'] != entry['sha256']:
+            return False
+        with self._lock:
+            entry['mtime_ns'] = fingerprint['mtime_ns']
+            self._dirty = True
+        return True
+
+    def record(self, input_path, output_path, settings_key, fingerprint, output_size=None, skipped=False):
+        """Remember a finished output; saved periodically so interrupted batches resume.
+
+        skipped records that no output is written for these settings, so the
+        source is not processed again while it stays the same.
+        """
+        entry = {
+            'input': os.path.abspath(input_path),
+            'size': fingerprint['size'],
+            'mtime_ns': fingerprint['mtime_ns'],
+            'settings': settings_key,
+        }
+        if skipped:
+            entry['action'] = 'skip'
+        else:
+            try:
+                output_stat = os.stat(output_path)
+            except OSError:
+                return
+            entry['output_size'] = output_stat.st_size
+            entry['output_mtime_ns'] = output_stat.st_mtime_ns
+        if output_size is not None:
+            entry['width'], entry['height'] = output_size
+        if self.use_hash:
+            entry['sha256'] = fingerprint.get('sha256') or file_sha256(input_path)
+
+        with self._lock:
+            self.entries[os.path.abspath(output_path)] = entry
+            self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Write the manifest atomically if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({'version': MANIFEST_VERSION, 'outputs': self.entries})
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # Not fatal: the next run simply redoes more work
+            with self._lock:
+                self._dirty = True
@@ -0,0 +1,170 @@
+"""
+Performance report of a batch run.
+
+Every resized file records how long it spent in each stage of the pipeline
+(open, decode, resample, encode, write) and how many bytes it read and
+wrote. The batch adds up the stages, tracks the peak memory of its worker
+processes and its throughput, and can export the lot as JSON or CSV so
+runs of different releases can be compared.
+"""
+import csv
+import json
+import os
+import sys
+import time
+
+# Stages of resizing one file, in pipeline order
+STAGES = ('open', 'decode', 'resample', 'encode', 'write')
+
+REPORT_VERSION = 1
+
+
+def new_file_stats():
+    """Empty per-file counters: seconds per stage, bytes read and written, and the stage in progress.
+
+    'copied' counts outputs written as an unchanged copy of the source, and
+    'not_upscaled' the targets the upscale policy left out, whose indexes
+    in the settings' targets are listed in 'skipped_targets'.
+    """
+    stats = dict.fromkeys(STAGES, 0.0)
+    stats['bytes_in'] = 0
+    stats['bytes_out'] = 0
+    stats['copied'] = 0
+    stats['not_upscaled'] = 0
+    stats['skipped_targets'] = []
+    stats['stage'] = STAGES[0]
+    return stats
+
+
+def add_time(stats, stage, start, next_stage=None):
+    """Add the time since start (a perf_counter value) to stage and return the current time.
+
+    next_stage, if given, becomes the stage in progress, so a failure
+    afterwards is reported against it.
+    """
+    now = time.perf_counter()
+    if stats is not None:
+        stats[stage] += now - start
+        if next_stage is not None:
+            stats['stage'] = next_stage
+    return now
+
+
+def peak_rss_bytes():
+    """Peak resident memory of the current process in bytes, or None when unknown"""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux and the BSDs kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _windows_peak_rss():
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def format_bytes(count):
+    """Human readable size such as '12.3 MB'"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.0f} {unit}" if unit == 'B' else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def summary_lines(result):
+    """Short human readable performance summary of a BatchResult"""
+    lines = [f"Output: {format_bytes(result.bytes_written)} from {format_bytes(result.bytes_read)} read, "
+             f"{result.images_per_second:.1f} images/s"]
+    busy = sum(result.stage_seconds.values())
+    if busy > 0:
+        lines.append("Time: " + ", ".join(
+            f"{stage} {result.stage_seconds[stage]:.1f} s ({result.stage_seconds[stage] * 100 / busy:.0f}%)"
+            for stage in STAGES))
+    if result.copied or result.not_upscaled:
+        lines.append(f"Passthrough: {result.copied} outputs copied without re-encoding, "
+                     f"{result.not_upscaled} upscales left out "
+                     f"({result.not_written} image{'s' if result.not_written != 1 else ''} without any output)")
+    if result.probe_seconds is not None:
+        lines.append(f"Planning: headers read in {result.probe_seconds:.2f} s, "
+                     f"{result.workers} worker{'s' if result.workers != 1 else ''}")
+    if result.peak_rss is not None:
+        lines.append(f"Peak worker memory: {format_bytes(result.peak_rss)}")
+    if result.deduplicated:
+        lines.append(f"Identical copies: {result.deduplicated} not resized again, saving about "
+                     f"{result.dedup_saved_seconds:.1f} s of work and "
+                     f"{format_bytes(result.dedup_saved_bytes)} of decoding")
+    return lines
+
+
+def report_data(result):
+    """JSON-serializable report of a BatchResult: totals plus one record per file"""
+    return {
+        'version': REPORT_VERSION,
+        'summary': {
+            'total': result.total,
+            'successful': result.successful,
+            'skipped': result.skipped,
+            'not_written': result.not_written,
+            'failed': len(result.failed),
+            'cancelled': result.cancelled,
+            'encode_profile': result.encode_profile,
+            'wall_seconds': round(result.wall_seconds, 4),
+            'images_per_second': round(result.images_per_second, 3),
+            'stage_seconds': {stage: round(seconds, 4) for stage, seconds in result.stage_seconds.items()},
+            'bytes_in': result.bytes_read,
+            'bytes_out': result.bytes_written,
+            'peak_rss': result.peak_rss,
+            'copied': result.copied,
+            'not_upscaled': result.not_upscaled,
+            'workers': result.workers,
+            'probe_seconds': None if result.probe_seconds is None else round(result.probe_seconds, 4),
+            'deduplicated': result.deduplicated,
+            'dedup_saved_seconds': round(result.dedup_saved_seconds, 4),
+            'dedup_saved_bytes': result.dedup_saved_bytes,
+        },
+        'files': result.files,
+    }
+
+
+def write_report(result, path):
+    """Export a BatchResult to path, as CSV (one row per file) when it ends in .csv, else as JSON"""
+    if os.path.splitext(path)[1].lower() == '.csv':
+        columns = ['path', 'error', 'stage', 'error_type', 'duplicate_of',
+                   *STAGES, 'bytes_in', 'bytes_out', 'copied', 'not_upscaled', 'peak_rss']
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(result.files)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report_data(result), f, indent=2)
@@ -0,0 +1,257 @@
+"""
+Header-only metadata probe for planning batches.
+
+Opening an image with Pillow only parses its header; the pixels are decoded
+on the first load(). That is enough to learn the dimensions, mode and format
+of every selected file in a fraction of the time a decode takes, and from
+them the memory a worker needs to resize it. Batches use the probe to start
+with the largest images, to refuse decompression bombs before any worker
+touches them and to run no more workers than the memory can hold.
+
+Results are cached by (path, mtime, file size), in memory and optionally in
+a small JSON file, so the preview grid and later batches reuse them.
+Dimensions are those of the image shown upright: EXIF orientations that
+turn it sideways swap the width and height.
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import ExifTags, Image
+
+from large_image import MB, can_decode_in_bands, decoded_bytes, decoder_orientation, open_unchecked
+
+CACHE_VERSION = 2
+
+# Header reads are mostly waiting on the disk
+PROBE_THREADS = 8
+
+# Images above Pillow's own warning size whose decoded pixels would take this
+# many times the file size are refused as decompression bombs
+BOMB_PIXELS = Image.MAX_IMAGE_PIXELS
+BOMB_RATIO = 100
+
+# Interpreter, Pillow and the encoded outputs of one worker process
+WORKER_BASE_BYTES = 64 * MB
+
+
+class ImageInfo(namedtuple('ImageInfo', 'width height mode format file_size bandable')):
+    """What the header of an image file tells about it.
+
+    bandable is True when the pixels are stored uncompressed, so an image
+    too big for the memory limit can still be decoded a band at a time.
+    """
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def decoded_bytes(self):
+        """Memory the decoded pixels take"""
+        return decoded_bytes(self.size, self.mode)
+
+    def is_bomb(self):
+        """Check whether the image expands far beyond its file when decoded"""
+        return (self.width * self.height > BOMB_PIXELS
+                and self.decoded_bytes > self.file_size * BOMB_RATIO)
+
+    def worker_bytes(self, memory_limit):
+        """Estimated peak memory of a worker resizing this image within memory_limit bytes"""
+        # The decode plus the resampled copy; bigger images are banded or refused
+        return min(self.decoded_bytes * 2, memory_limit) + WORKER_BASE_BYTES
+
+
+def read_exif(img):
+    """EXIF of an opened image as an Image.Exif, or None, without decoding the pixels.
+
+    Only EXIF found in the header is used; Pillow would decode a whole PNG
+    to look for an eXIf chunk stored after the pixels.
+    """
+    if img.format == 'TIFF' or 'exif' in img.info:
+        try:
+            return img.getexif()
+        except (OSError, SyntaxError, ValueError):
+            return None  # Damaged EXIF is ignored, like a missing one
+    return None
+
+
+def exif_orientation(img):
+    """EXIF orientation (1 to 8) still to apply to an opened image once loaded.
+
+    1 when the image is upright, or when Pillow turns it upright itself
+    (then its size is already reported upright too).
+    """
+    if decoder_orientation(img) != 1:
+        return 1
+    exif = read_exif(img)
+    orientation = exif.get(ExifTags.Base.Orientation, 1) if exif is not None else 1
+    return orientation if orientation in range(1, 9) else 1
+
+
+def probe_image(path):
+    """Read the header of the image at path into an ImageInfo, without decoding pixels"""
+    file_size = os.path.getsize(path)
+    with open_unchecked(path) as img:
+        width, height = img.size
+        if exif_orientation(img) >= 5:
+            width, height = height, width
+        return ImageInfo(width, height, img.mode, img.format, file_size, can_decode_in_bands(img))
+
+
+class ProbeCache:
+    """ImageInfo per (path, mtime, file size), kept in memory and optionally in a JSON file"""
+
+    def __init__(self, path=None, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> ImageInfo, least recently used first
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def make_key(image_path):
+        """Cache key for image_path; changes whenever the file does"""
+        stat = os.stat(image_path)
+        return f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    def get(self, key):
+        """Return the cached ImageInfo for key, or None"""
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+            return info
+
+    def put(self, key, info):
+        """Add an ImageInfo to the cache"""
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def get_or_probe(self, image_path):
+        """Return the ImageInfo of image_path, reading its header on a miss"""
+        key = self.make_key(image_path)
+        info = self.get(key)
+        if info is None:
+            info = probe_image(image_path)
+            self.put(key, info)
+        return info
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            try:
+                self._entries.update((key, ImageInfo(*fields)) for key, fields in data.get('images', {}).items())
+            except TypeError:
+                self._entries.clear()
+
+    def save(self):
+        """Write the cache file atomically if anything changed"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({'version': CACHE_VERSION, 'images': self._entries})
+            self._dirty = False
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The cache is only an optimisation
+            with self._lock:
+                self._dirty = True
+
+
+def probe_images(paths, cache=None, threads=PROBE_THREADS):
+    """Probe the headers of paths in parallel; returns {path: ImageInfo or None when unreadable}"""
+    cache = cache if cache is not None else ProbeCache()
+
+    def probe(path):
+        try:
+            return cache.get_or_probe(path)
+        except Exception:
+            # Not an image or not readable: the worker reports it properly
+            return None
+
+    paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max(1, threads), thread_name_prefix='probe') as executor:
+        return dict(zip(paths, executor.map(probe, paths)))
+
+
+def available_memory_bytes():
+    """Physical memory that is free right now (total memory where that is unknown), or None"""
+    if hasattr(os, 'sysconf'):
+        for name in ('SC_AVPHYS_PAGES', 'SC_PHYS_PAGES'):
+            try:
+                pages = os.sysconf(name)
+                page_size = os.sysconf('SC_PAGE_SIZE')
+            except (ValueError, OSError):
+                continue
+            if pages > 0 and page_size > 0:
+                return pages * page_size
+    if sys.platform == 'win32':
+        return _windows_available_memory()
+    return None
+
+
+def _windows_available_memory():
+    try:
+        import ctypes
+    except ImportError:
+        return None
+
+    class MemoryStatusEx(ctypes.Structure):
+        _fields_ = [
+            ('dwLength', ctypes.c_ulong),
+            ('dwMemoryLoad', ctypes.c_ulong),
+            ('ullTotalPhys', ctypes.c_ulonglong),
+            ('ullAvailPhys', ctypes.c_ulonglong),
+            ('ullTotalPageFile', ctypes.c_ulonglong),
+            ('ullAvailPageFile', ctypes.c_ulonglong),
+            ('ullTotalVirtual', ctypes.c_ulonglong),
+            ('ullAvailVirtual', ctypes.c_ulonglong),
+            ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+        ]
+
+    try:
+        status = MemoryStatusEx()
+        status.dwLength = ctypes.sizeof(status)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return status.ullAvailPhys
+
+
+def suggest_workers(infos, memory_limit, max_workers, available=None):
+    """Number of workers (at most max_workers) that fit in memory while resizing infos.
+
+    Every worker is assumed to hold the largest image at the same time, so
+    the estimate errs on the safe side. available defaults to the free
+    physical memory; when that is unknown max_workers is returned.
+    """
+    available = available if available is not None else available_memory_bytes()
+    infos = [info for info in infos if info is not None]
+    if not available or not infos:
+        return max_workers
+    per_worker = max(info.worker_bytes(memory_limit) for info in infos)
+    return max(1, min(max_workers, available // per_worker))
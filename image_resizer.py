@@ -1,13 +1,52 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+    from PIL import ImageTk
+except ImportError:  # Headless installs can still use the command line
+    tk = None
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
 import os
+import queue
+import sys
+
+from batch_manifest import BatchManifest
+from batch_report import summary_lines, write_report
+from image_probe import ProbeCache
+from image_selection import ImageSelection
+from resize_engine import (
+    DEFAULT_ENCODE_PROFILE,
+    DEFAULT_FIT_MODE,
+    DEFAULT_MEMORY_LIMIT_MB,
+    DEFAULT_METADATA,
+    DEFAULT_NAME_TEMPLATE,
+    DEFAULT_RESAMPLE_SPACE,
+    DEFAULT_UPSCALE,
+    ENCODE_PROFILES,
+    FIT_MODES,
+    METADATA_POLICIES,
+    OUTPUT_FORMATS,
+    PRESETS,
+    UPSCALE_POLICIES,
+    BatchResizer,
+    ResizeSettings,
+    TaskFeed,
+    available_output_formats,
+    available_resample_spaces,
+    default_worker_count,
+    iter_image_files,
+    output_paths_for,
+)
+from thumbnail_cache import ThumbnailCache, user_cache_dir
 
 class ImageResizerApp:
+    keep_format_label = "Same as input"
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Image Resizer Pro")
-        self.root.geometry("700x750")
+        self.root.geometry("700x930")
         self.root.resizable(False, False)
         
         # Modern color scheme
@@ -32,12 +71,45 @@ class ImageResizerApp:
         self.output_path_var = tk.StringVar()
         self.width_var = tk.StringVar()
         self.height_var = tk.StringVar()
-        self.selected_images = []  # Store list of selected image paths
-        self.selected_image_widgets = []  # Store widgets that are currently selected for removal
-        self.image_preview_widgets = []  # Store all image preview widgets
+        self.selected_images = ImageSelection()  # Ordered, duplicate-free selected image paths
+        self.selected_preview_ids = set()  # Ids of the images clicked in the grid for removal
+        self.preview_tiles = {}  # Grid index -> preview tile currently showing it
+        self.spare_preview_tiles = []  # Scrolled-out tiles waiting to be reused
+        self.preview_refresh_pending = False
+        self.visible_preview_paths = set()  # Paths of the tiles currently in view
+        
+        # Thumbnails decode on background threads and stream into the grid
+        self.thumbnail_executor = ThreadPoolExecutor(
+            max_workers=min(4, default_worker_count()), thread_name_prefix='thumbnail')
+        self.thumbnail_queue = queue.Queue()
+        self.pending_thumbnails = set()
+        self.thumbnail_poll_scheduled = False
+        self.workers_var = tk.StringVar(value=str(default_worker_count()))
+        self.memory_limit_var = tk.StringVar(value=str(DEFAULT_MEMORY_LIMIT_MB))
+        self.encode_profile_var = tk.StringVar(value=DEFAULT_ENCODE_PROFILE)
+        self.output_format_var = tk.StringVar(value=self.keep_format_label)
+        self.fit_mode_var = tk.StringVar(value=DEFAULT_FIT_MODE)
+        self.smart_crop_var = tk.BooleanVar(value=False)
+        self.upscale_var = tk.StringVar(value=DEFAULT_UPSCALE)
+        self.metadata_var = tk.StringVar(value=DEFAULT_METADATA)
+        self.resample_space_var = tk.StringVar(value=DEFAULT_RESAMPLE_SPACE)
+        self.batch = None  # Running BatchResizer, if any
+        self.last_batch_result = None  # BatchResult of the last finished batch, for the report
+        self.folder_scan = None  # TaskFeed of a folder being scanned, if any
+        self.input_folders = []  # Folders whose images were added; their subfolders are kept in the output
+        self.batch_tasks = None  # Task queue of the running batch, fed while scanning
+        self.batch_follows_scan = False  # Whether the running batch takes files found by the scan
+        self.recursive_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.dedup_var = tk.BooleanVar(value=False)
+        self.preset_vars = {key: tk.BooleanVar(value=False) for key in PRESETS}  # Multi-size output
+        self.name_template_var = tk.StringVar(value=DEFAULT_NAME_TEMPLATE)
+        self.thumbnail_cache = ThumbnailCache(disk_dir=os.path.join(user_cache_dir(), 'thumbnails'))
+        self.probe_cache = ProbeCache(os.path.join(user_cache_dir(), 'probe_cache.json'))
         
         # Create modern UI
         self.create_modern_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def create_modern_ui(self):
         """Create modern, sleek UI"""
@@ -79,6 +151,9 @@ class ImageResizerApp:
         # Output section
         self.create_section(main_container, "Output Location", self.create_output_section)
         
+        # Processing options section
+        self.create_section(main_container, "Processing Options", self.create_options_section)
+        
         # Progress section (initially hidden)
         self.create_progress_section(main_container)
         
@@ -139,6 +214,22 @@ class ImageResizerApp:
         )
         browse_btn.pack(side='left', padx=(0, 10))
         
+        # Browse folder button
+        folder_btn = tk.Button(
+            button_frame,
+            text="Select Folder",
+            command=self.open_folder_input,
+            font=('Segoe UI', 10, 'bold'),
+            bg=self.colors['primary'],
+            fg=self.colors['text'],
+            relief='flat',
+            bd=0,
+            padx=20,
+            pady=10,
+            cursor='hand2'
+        )
+        folder_btn.pack(side='left', padx=(0, 10))
+        
         # Clear selection button
         clear_btn = tk.Button(
             button_frame,
@@ -171,6 +262,20 @@ class ImageResizerApp:
         )
         remove_btn.pack(side='left')
         
+        # Include subfolders when selecting a folder
+        recursive_check = tk.Checkbutton(
+            input_container,
+            text="Include subfolders",
+            variable=self.recursive_var,
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['surface'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            selectcolor=self.colors['bg']
+        )
+        recursive_check.pack(anchor='w')
+        
         # Selected images display
         self.images_display_frame = tk.Frame(input_container, bg=self.colors['surface'])
         self.images_display_frame.pack(fill='x')
@@ -190,11 +295,17 @@ class ImageResizerApp:
         
         # Hover effects
         self.add_hover_effect(browse_btn, self.colors['primary'], self.colors['primary_hover'])
+        self.add_hover_effect(folder_btn, self.colors['primary'], self.colors['primary_hover'])
         self.add_hover_effect(clear_btn, self.colors['warning'], '#e67c00')
         self.add_hover_effect(remove_btn, '#d13438', '#b12328')
     
+    # Preview grid layout: only the rows in view plus this many extra rows get tiles
+    preview_columns = 3
+    preview_overscan_rows = 1
+    preview_tile_padding = 10
+    
     def create_scrollable_image_grid(self):
-        """Create scrollable grid for image previews"""
+        """Create virtualized scrollable grid for image previews"""
         # Main container for scrollable content
         canvas_container = tk.Frame(self.images_display_frame, bg=self.colors['surface'])
         canvas_container.pack(fill='both', expand=True)
@@ -208,31 +319,37 @@ class ImageResizerApp:
         )
         
         # Scrollbar for canvas
-        scrollbar_v = tk.Scrollbar(canvas_container, orient='vertical', command=self.image_canvas.yview)
-        self.image_canvas.configure(yscrollcommand=scrollbar_v.set)
-        
-        # Scrollable frame inside canvas
-        self.scrollable_frame = tk.Frame(self.image_canvas, bg=self.colors['surface'])
-        self.canvas_window = self.image_canvas.create_window((0, 0), window=self.scrollable_frame, anchor='nw')
+        self.preview_scrollbar = tk.Scrollbar(canvas_container, orient='vertical', command=self.image_canvas.yview)
+        self.image_canvas.configure(yscrollcommand=self._on_canvas_scroll)
         
         # Pack canvas and scrollbar
         self.image_canvas.pack(side='left', fill='both', expand=True)
-        scrollbar_v.pack(side='right', fill='y')
+        self.preview_scrollbar.pack(side='right', fill='y')
         
-        # Bind mousewheel to canvas
+        # Blank thumbnail shown until a tile's image is ready
+        self.preview_placeholder = tk.PhotoImage(width=120, height=120)
+        self.preview_placeholder.put(self.colors['surface'], to=(0, 0, 120, 120))
+        
+        # Measure one tile so rows can be positioned without creating them all
+        tile = self.create_preview_tile()
+        tile.update_idletasks()
+        self.preview_tile_size = (tile.winfo_reqwidth(), tile.winfo_reqheight())
+        self.spare_preview_tiles.append(tile)
+        
+        # Refresh visible tiles when the canvas is resized
         self.image_canvas.bind('<Configure>', self._on_canvas_configure)
-        self.scrollable_frame.bind('<Configure>', self._on_frame_configure)
         
         # Bind mousewheel events
         self._bind_mousewheel()
     
     def _on_canvas_configure(self, event):
         """Handle canvas resize"""
-        self.image_canvas.itemconfig(self.canvas_window, width=event.width)
+        self.schedule_preview_refresh()
     
-    def _on_frame_configure(self, event):
-        """Handle frame resize"""
-        self.image_canvas.configure(scrollregion=self.image_canvas.bbox('all'))
+    def _on_canvas_scroll(self, first, last):
+        """Keep the scrollbar in sync and fill rows scrolled into view"""
+        self.preview_scrollbar.set(first, last)
+        self.schedule_preview_refresh()
     
     def _bind_mousewheel(self):
         """Bind mousewheel events for scrolling"""
@@ -249,41 +366,24 @@ class ImageResizerApp:
         self.image_canvas.bind('<Leave>', _unbind_from_mousewheel)
     
     def create_image_thumbnail(self, image_path, size=(120, 120)):
-        """Create thumbnail from image path"""
+        """Create thumbnail from image path, reusing cached thumbnails"""
         try:
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary (for PNG with transparency, etc.)
-                if img.mode in ('RGBA', 'LA'):
-                    # Create a white background
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'RGBA':
-                        background.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
-                    else:
-                        background.paste(img)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Create thumbnail maintaining aspect ratio
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-                
-                # Create a new image with fixed size and center the thumbnail
-                thumb = Image.new('RGB', size, (45, 45, 45))  # Dark background
-                x = (size[0] - img.width) // 2
-                y = (size[1] - img.height) // 2
-                thumb.paste(img, (x, y))
-                
-                return thumb
+            return self.thumbnail_cache.get_or_create(image_path, size)
         except Exception as e:
             # Return a placeholder image if thumbnail creation fails
             placeholder = Image.new('RGB', size, (100, 100, 100))
             return placeholder
     
-    def create_image_preview_widget(self, image_path, index):
-        """Create a preview widget for an image"""
+    def create_photo_image(self, thumbnail):
+        """Convert a PIL thumbnail to a Tk PhotoImage"""
+        # Copies the pixels straight into the Tk photo, no PNG encode/decode
+        return ImageTk.PhotoImage(thumbnail, master=self.root)
+    
+    def create_preview_tile(self):
+        """Create an empty, hidden preview tile that can show any image"""
         # Create container frame
         preview_frame = tk.Frame(
-            self.scrollable_frame,
+            self.image_canvas,
             bg=self.colors['bg'],
             relief='solid',
             bd=2,
@@ -292,53 +392,46 @@ class ImageResizerApp:
             pady=5
         )
         
-        # Create thumbnail
-        thumbnail = self.create_image_thumbnail(image_path)
-        
-        # Convert PIL image to PhotoImage
-        import io
-        import base64
-        
-        # Save thumbnail to bytes and convert to base64
-        img_bytes = io.BytesIO()
-        thumbnail.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        img_data = base64.b64encode(img_bytes.read())
-        
-        # Create PhotoImage from base64 data
-        photo = tk.PhotoImage(data=img_data)
-        
         # Image label
         img_label = tk.Label(
             preview_frame,
-            image=photo,
+            image=self.preview_placeholder,
             bg=self.colors['bg'],
             cursor='hand2'
         )
-        img_label.image = photo  # Keep reference
         img_label.pack(pady=5)
         
         # Filename label
-        filename = os.path.basename(image_path)
-        if len(filename) > 15:
-            display_name = filename[:12] + "..."
-        else:
-            display_name = filename
-            
         name_label = tk.Label(
             preview_frame,
-            text=display_name,
+            text="",
             font=('Segoe UI', 8),
             fg=self.colors['text'],
             bg=self.colors['bg'],
             cursor='hand2'
         )
-        name_label.pack(pady=(0, 5))
+        name_label.pack()
+        
+        # Dimensions label, filled in once the header has been probed
+        size_label = tk.Label(
+            preview_frame,
+            text="",
+            font=('Segoe UI', 7),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['bg'],
+            cursor='hand2'
+        )
+        size_label.pack(pady=(0, 5))
         
         # Store references
-        preview_frame.image_path = image_path
-        preview_frame.index = index
-        preview_frame.selected = False
+        preview_frame.img_label = img_label
+        preview_frame.name_label = name_label
+        preview_frame.size_label = size_label
+        preview_frame.image_path = None
+        preview_frame.index = None
+        preview_frame.image_id = None
+        preview_frame.window_id = self.image_canvas.create_window(
+            0, 0, window=preview_frame, anchor='nw', state='hidden')
         
         # Bind click events
         def on_click(event):
@@ -347,54 +440,187 @@ class ImageResizerApp:
         preview_frame.bind('<Button-1>', on_click)
         img_label.bind('<Button-1>', on_click)
         name_label.bind('<Button-1>', on_click)
+        size_label.bind('<Button-1>', on_click)
         
         return preview_frame
     
+    def bind_preview_tile(self, tile, index, image_id):
+        """Show the image with image_id in a recycled preview tile"""
+        image_path = self.selected_images.path(image_id)
+        tile.index = index
+        tile.image_id = image_id
+        tile.image_path = image_path
+        
+        # Show cached thumbnails right away, decode the rest in the background
+        try:
+            key = self.thumbnail_cache.make_key(image_path, (120, 120))
+            thumbnail = self.thumbnail_cache.get(key, disk=False)
+            info = self.probe_cache.get(self.probe_cache.make_key(image_path))
+        except OSError:
+            thumbnail = info = None
+        if thumbnail is not None:
+            self.set_tile_thumbnail(tile, thumbnail)
+        else:
+            tile.img_label.config(image=self.preview_placeholder)
+            tile.img_label.image = None
+        self.set_tile_info(tile, info)
+        if thumbnail is None or info is None:
+            self.request_thumbnail(image_path)
+        
+        # Filename label
+        filename = os.path.basename(image_path)
+        if len(filename) > 15:
+            display_name = filename[:12] + "..."
+        else:
+            display_name = filename
+        tile.name_label.config(text=display_name)
+        
+        self.style_preview_tile(tile, image_id in self.selected_preview_ids)
+    
+    def set_tile_thumbnail(self, tile, thumbnail):
+        """Show a decoded thumbnail in a preview tile"""
+        photo = self.create_photo_image(thumbnail)
+        tile.img_label.config(image=photo)
+        tile.img_label.image = photo  # Keep reference
+    
+    def set_tile_info(self, tile, info):
+        """Show the probed dimensions of an image in its preview tile"""
+        tile.size_label.config(text="" if info is None else f"{info.width} × {info.height}")
+    
+    def request_thumbnail(self, image_path):
+        """Decode the thumbnail (and probe the header) of image_path on the thumbnail thread pool"""
+        if image_path in self.pending_thumbnails:
+            return
+        self.pending_thumbnails.add(image_path)
+        self.thumbnail_executor.submit(self.load_thumbnail, image_path)
+        if not self.thumbnail_poll_scheduled:
+            self.thumbnail_poll_scheduled = True
+            self.root.after(50, self.poll_thumbnails)
+    
+    def load_thumbnail(self, image_path):
+        """Runs on a worker thread: decode one thumbnail, probe its header and post both to the UI"""
+        # Skip tiles that were scrolled away while the request was queued
+        info = None
+        if image_path not in self.visible_preview_paths:
+            thumbnail = None
+        else:
+            thumbnail = self.create_image_thumbnail(image_path)
+            try:
+                info = self.probe_cache.get_or_probe(image_path)
+            except Exception:
+                pass  # Not an image; the tile just shows no dimensions
+        self.thumbnail_queue.put((image_path, thumbnail, info))
+    
+    def poll_thumbnails(self):
+        """Move finished thumbnails from the worker threads into their tiles"""
+        finished = []
+        try:
+            while True:
+                finished.append(self.thumbnail_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if finished:
+            tiles_by_path = {tile.image_path: tile for tile in self.preview_tiles.values()}
+            for image_path, thumbnail, info in finished:
+                self.pending_thumbnails.discard(image_path)
+                tile = tiles_by_path.get(image_path)
+                if tile is None:
+                    continue
+                if thumbnail is None:
+                    # Skipped while out of view but back in view now
+                    self.request_thumbnail(image_path)
+                else:
+                    self.set_tile_thumbnail(tile, thumbnail)
+                    self.set_tile_info(tile, info)
+        
+        if self.pending_thumbnails:
+            self.root.after(50, self.poll_thumbnails)
+        else:
+            self.thumbnail_poll_scheduled = False
+    
+    def schedule_preview_refresh(self):
+        """Refresh the visible tiles once the current event has been handled"""
+        if not self.preview_refresh_pending:
+            self.preview_refresh_pending = True
+            self.root.after_idle(self.refresh_preview_tiles)
+    
+    def refresh_preview_tiles(self):
+        """Give a tile to every grid position in view and recycle the rest"""
+        self.preview_refresh_pending = False
+        cols = self.preview_columns
+        tile_width, tile_height = self.preview_tile_size
+        col_width = tile_width + self.preview_tile_padding
+        row_height = tile_height + self.preview_tile_padding
+        
+        # Grid indices of the rows in the viewport plus overscan
+        top = self.image_canvas.canvasy(0)
+        bottom = top + self.image_canvas.winfo_height()
+        first_row = max(0, int(top // row_height) - self.preview_overscan_rows)
+        last_row = int(bottom // row_height) + self.preview_overscan_rows
+        first = first_row * cols
+        last = min(len(self.selected_images), (last_row + 1) * cols)
+        visible_ids = self.selected_images.ids(first, last)
+        self.visible_preview_paths = {self.selected_images.path(image_id) for image_id in visible_ids}
+        
+        # Hide tiles that left the window so they can be reused
+        for index in list(self.preview_tiles):
+            if not first <= index < last:
+                tile = self.preview_tiles.pop(index)
+                self.image_canvas.itemconfigure(tile.window_id, state='hidden')
+                self.spare_preview_tiles.append(tile)
+        
+        for index, image_id in enumerate(visible_ids, first):
+            tile = self.preview_tiles.get(index)
+            if tile is None:
+                tile = self.spare_preview_tiles.pop() if self.spare_preview_tiles else self.create_preview_tile()
+                self.preview_tiles[index] = tile
+            if tile.image_id != image_id or tile.index != index:
+                self.bind_preview_tile(tile, index, image_id)
+            
+            x = (index % cols) * col_width + self.preview_tile_padding // 2
+            y = (index // cols) * row_height + self.preview_tile_padding // 2
+            self.image_canvas.coords(tile.window_id, x, y)
+            self.image_canvas.itemconfigure(tile.window_id, state='normal')
+    
+    def style_preview_tile(self, widget, selected):
+        """Show whether a preview tile is selected for removal"""
+        if selected:
+            color, border = self.colors['primary'], 3
+        else:
+            color, border = self.colors['bg'], 2
+        widget.config(
+            bg=color, 
+            highlightbackground=color,
+            relief='solid',
+            bd=border
+        )
+        # Update all child widgets
+        for child in widget.winfo_children():
+            child.config(bg=color)
+    
     def toggle_image_selection(self, widget):
         """Toggle selection state of an image widget"""
-        if widget.selected:
+        if widget.image_id is None:
+            return
+        if widget.image_id in self.selected_preview_ids:
             # Deselect
-            widget.selected = False
-            widget.config(
-                bg=self.colors['bg'], 
-                highlightbackground=self.colors['bg'],
-                relief='solid',
-                bd=2
-            )
-            # Update all child widgets
-            for child in widget.winfo_children():
-                child.config(bg=self.colors['bg'])
-            if widget in self.selected_image_widgets:
-                self.selected_image_widgets.remove(widget)
+            self.selected_preview_ids.discard(widget.image_id)
+            self.style_preview_tile(widget, False)
         else:
             # Select
-            widget.selected = True
-            widget.config(
-                bg=self.colors['primary'], 
-                highlightbackground=self.colors['primary'],
-                relief='solid',
-                bd=3
-            )
-            # Update all child widgets
-            for child in widget.winfo_children():
-                child.config(bg=self.colors['primary'])
-            self.selected_image_widgets.append(widget)
+            self.selected_preview_ids.add(widget.image_id)
+            self.style_preview_tile(widget, True)
         
     def create_presets_section(self, parent):
         """Create presets section with Hero, Product, and Hero Image"""
         presets_container = tk.Frame(parent, bg=self.colors['surface'])
         presets_container.pack(fill='x')
         
-        presets = [
-            ("Hero (1259 × 1008)", 1259, 1008),
-            ("Product (390 × 450)", 390, 450),
-            ("Hero Image (1600 × 500)", 1600, 500)
-        ]
-        
-        for i, (name, w, h) in enumerate(presets):
+        for i, (name, w, h) in enumerate(PRESETS.values()):
             btn = tk.Button(
                 presets_container,
-                text=name,
+                text=f"{name} ({w} × {h})",
                 command=lambda w=w, h=h: self.set_dimensions(w, h),
                 font=('Segoe UI', 11, 'bold'),
                 bg=self.colors['secondary'],
@@ -416,6 +642,34 @@ class ImageResizerApp:
                 
             # Add hover effect
             self.add_hover_effect(btn, self.colors['secondary'], '#0099cc')
+        
+        # Several presets can be written from a single decode of each image
+        multi_container = tk.Frame(parent, bg=self.colors['surface'])
+        multi_container.pack(fill='x', pady=(10, 0))
+        
+        multi_label = tk.Label(
+            multi_container,
+            text="Write all checked sizes:",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        multi_label.pack(side='left', padx=(0, 10))
+        
+        for key, (name, w, h) in PRESETS.items():
+            preset_check = tk.Checkbutton(
+                multi_container,
+                text=name,
+                variable=self.preset_vars[key],
+                command=self.validate_inputs,
+                font=('Segoe UI', 10),
+                fg=self.colors['text'],
+                bg=self.colors['surface'],
+                activebackground=self.colors['surface'],
+                activeforeground=self.colors['text'],
+                selectcolor=self.colors['bg']
+            )
+            preset_check.pack(side='left', padx=(0, 10))
             
     def create_dimensions_section(self, parent):
         """Create modern dimensions input"""
@@ -474,6 +728,68 @@ class ImageResizerApp:
         )
         self.height_entry.pack(fill='x', ipady=10, ipadx=10)
         
+        # How images with a different aspect ratio are fitted into the size
+        mode_frame = tk.Frame(parent, bg=self.colors['surface'])
+        mode_frame.pack(fill='x', pady=(10, 0))
+        
+        mode_label = tk.Label(
+            mode_frame,
+            text="Resize mode",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        mode_label.pack(side='left', padx=(0, 10))
+        
+        mode_menu = tk.OptionMenu(mode_frame, self.fit_mode_var, *FIT_MODES)
+        mode_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        mode_menu.pack(side='left')
+        
+        smart_crop_check = tk.Checkbutton(
+            mode_frame,
+            text="Smart crop (fill)",
+            variable=self.smart_crop_var,
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['surface'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            selectcolor=self.colors['bg']
+        )
+        smart_crop_check.pack(side='left', padx=(15, 0))
+        
+        # Images smaller than the target: enlarge, leave out or copy as they are
+        upscale_menu = tk.OptionMenu(mode_frame, self.upscale_var, *UPSCALE_POLICIES)
+        upscale_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        upscale_menu.pack(side='right')
+        
+        upscale_label = tk.Label(
+            mode_frame,
+            text="Upscale",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        upscale_label.pack(side='right', padx=(0, 10))
+        
     def create_output_section(self, parent):
         """Create modern output section"""
         output_container = tk.Frame(parent, bg=self.colors['surface'])
@@ -514,6 +830,224 @@ class ImageResizerApp:
         # Hover effect
         self.add_hover_effect(location_btn, self.colors['warning'], '#e67c00')
     
+    def create_options_section(self, parent):
+        """Create processing options section"""
+        options_container = tk.Frame(parent, bg=self.colors['surface'])
+        options_container.pack(fill='x')
+        
+        # Worker count input
+        workers_label = tk.Label(
+            options_container,
+            text="Parallel workers",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        workers_label.grid(row=0, column=0, sticky='w', padx=(0, 10))
+        
+        self.workers_spinbox = tk.Spinbox(
+            options_container,
+            from_=1,
+            to=max(64, default_worker_count()),
+            textvariable=self.workers_var,
+            width=5,
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            buttonbackground=self.colors['surface'],
+            relief='solid',
+            bd=1,
+            justify='center',
+            insertbackground=self.colors['text']
+        )
+        self.workers_spinbox.grid(row=0, column=1, sticky='w')
+        
+        # Incremental mode: skip images whose output is already up to date
+        incremental_check = tk.Checkbutton(
+            options_container,
+            text="Skip unchanged images (resume previous batches)",
+            variable=self.incremental_var,
+            font=('Segoe UI', 10),
+            fg=self.colors['text'],
+            bg=self.colors['surface'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            selectcolor=self.colors['bg']
+        )
+        incremental_check.grid(row=0, column=2, sticky='w', padx=(20, 0))
+        
+        # Output file naming
+        template_label = tk.Label(
+            options_container,
+            text="File names",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        template_label.grid(row=1, column=0, sticky='w', padx=(0, 10), pady=(10, 0))
+        
+        self.name_template_entry = tk.Entry(
+            options_container,
+            textvariable=self.name_template_var,
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            relief='solid',
+            bd=1,
+            insertbackground=self.colors['text']
+        )
+        self.name_template_entry.grid(row=1, column=1, columnspan=2, sticky='we', pady=(10, 0))
+        
+        template_hint = tk.Label(
+            options_container,
+            text="Fields: {name} {ext} {preset} {width} {height}",
+            font=('Segoe UI', 9),
+            fg=self.colors['text_secondary'],
+            bg=self.colors['surface']
+        )
+        template_hint.grid(row=2, column=1, columnspan=2, sticky='w')
+        
+        # Memory limit per worker; bigger uncompressed images are processed in strips
+        memory_label = tk.Label(
+            options_container,
+            text="Memory limit (MB)",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        memory_label.grid(row=3, column=0, sticky='w', padx=(0, 10), pady=(10, 0))
+        
+        self.memory_limit_spinbox = tk.Spinbox(
+            options_container,
+            from_=64,
+            to=65536,
+            increment=64,
+            textvariable=self.memory_limit_var,
+            width=7,
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            buttonbackground=self.colors['surface'],
+            relief='solid',
+            bd=1,
+            justify='center',
+            insertbackground=self.colors['text']
+        )
+        self.memory_limit_spinbox.grid(row=3, column=1, sticky='w', pady=(10, 0))
+        
+        # Encode profile: trade encoding time against file size
+        profile_frame = tk.Frame(options_container, bg=self.colors['surface'])
+        profile_frame.grid(row=3, column=2, sticky='w', padx=(20, 0), pady=(10, 0))
+        
+        profile_label = tk.Label(
+            profile_frame,
+            text="Encoding",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        profile_label.pack(side='left', padx=(0, 10))
+        
+        profile_menu = tk.OptionMenu(profile_frame, self.encode_profile_var, *ENCODE_PROFILES)
+        profile_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        profile_menu.pack(side='left')
+        
+        # Output format conversion
+        format_label = tk.Label(
+            options_container,
+            text="Output format",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        format_label.grid(row=4, column=0, sticky='w', padx=(0, 10), pady=(10, 0))
+        
+        format_choices = [self.keep_format_label] + [key.upper() for key in available_output_formats()]
+        format_menu = tk.OptionMenu(options_container, self.output_format_var, *format_choices)
+        format_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        format_menu.grid(row=4, column=1, sticky='w', pady=(10, 0))
+        
+        # Metadata policy: keep EXIF/ICC/XMP, only the color profile, or nothing
+        metadata_frame = tk.Frame(options_container, bg=self.colors['surface'])
+        metadata_frame.grid(row=4, column=2, sticky='w', padx=(20, 0), pady=(10, 0))
+        
+        metadata_label = tk.Label(
+            metadata_frame,
+            text="Metadata",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        metadata_label.pack(side='left', padx=(0, 10))
+        
+        metadata_menu = tk.OptionMenu(metadata_frame, self.metadata_var, *METADATA_POLICIES)
+        metadata_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        metadata_menu.pack(side='left')
+        
+        # Resampling color space: as stored, premultiplied alpha, or linear light (needs NumPy)
+        resample_label = tk.Label(
+            options_container,
+            text="Resampling",
+            font=('Segoe UI', 10, 'bold'),
+            fg=self.colors['text'],
+            bg=self.colors['surface']
+        )
+        resample_label.grid(row=5, column=0, sticky='w', padx=(0, 10), pady=(10, 0))
+        
+        resample_menu = tk.OptionMenu(options_container, self.resample_space_var, *available_resample_spaces())
+        resample_menu.config(
+            font=('Segoe UI', 10),
+            bg=self.colors['bg'],
+            fg=self.colors['text'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            highlightthickness=0,
+            relief='solid',
+            bd=1
+        )
+        resample_menu.grid(row=5, column=1, columnspan=2, sticky='w', pady=(10, 0))
+        
+        # Byte-identical sources are resized once and their outputs hardlinked
+        dedup_check = tk.Checkbutton(
+            options_container,
+            text="Resize identical files once (hardlink the copies' outputs)",
+            variable=self.dedup_var,
+            font=('Segoe UI', 10),
+            fg=self.colors['text'],
+            bg=self.colors['surface'],
+            activebackground=self.colors['surface'],
+            activeforeground=self.colors['text'],
+            selectcolor=self.colors['bg']
+        )
+        dedup_check.grid(row=6, column=0, columnspan=3, sticky='w', pady=(10, 0))
+        
     def create_progress_section(self, parent):
         """Create progress section for batch processing"""
         self.progress_section_frame = tk.Frame(parent, bg=self.colors['bg'])
@@ -569,7 +1103,24 @@ class ImageResizerApp:
             fg=self.colors['text_secondary'],
             bg=self.colors['surface']
         )
-        self.progress_percent_label.pack(anchor='w')
+        self.progress_percent_label.pack(side='left')
+        
+        # Cancel button
+        self.cancel_button = tk.Button(
+            progress_container,
+            text="Cancel",
+            command=self.cancel_batch_resize,
+            font=('Segoe UI', 9, 'bold'),
+            bg='#d13438',
+            fg=self.colors['text'],
+            relief='flat',
+            bd=0,
+            padx=15,
+            pady=4,
+            cursor='hand2'
+        )
+        self.cancel_button.pack(side='right')
+        self.add_hover_effect(self.cancel_button, '#d13438', '#b12328')
         
     def create_action_button(self, parent):
         """Create the main action button"""
@@ -595,6 +1146,21 @@ class ImageResizerApp:
         # Hover effect for enabled state
         self.add_hover_effect(self.resize_button, self.colors['success'], '#0e6b0e')
         
+        # Performance report of the last batch, shown once a batch has finished
+        self.export_report_button = tk.Button(
+            button_frame,
+            text="Export performance report...",
+            command=self.export_batch_report,
+            font=('Segoe UI', 9),
+            bg=self.colors['bg'],
+            fg=self.colors['text_secondary'],
+            activebackground=self.colors['bg'],
+            activeforeground=self.colors['text'],
+            relief='flat',
+            bd=0,
+            cursor='hand2'
+        )
+        
         # Bind input changes to enable/disable button
         self.output_path_var.trace('w', self.validate_inputs)
         self.width_var.trace('w', self.validate_inputs)
@@ -615,10 +1181,12 @@ class ImageResizerApp:
         
     def validate_inputs(self, *args):
         """Enable/disable resize button based on inputs"""
+        has_size = (self.checked_presets() or
+                    (self.width_var.get().strip() and self.height_var.get().strip()))
         if (len(self.selected_images) > 0 and 
+            self.batch is None and
             self.output_path_var.get().strip() and 
-            self.width_var.get().strip() and 
-            self.height_var.get().strip()):
+            has_size):
             self.resize_button.config(
                 state='normal',
                 bg=self.colors['success']
@@ -629,6 +1197,10 @@ class ImageResizerApp:
                 bg='#666666'
             )
             
+    def checked_presets(self):
+        """Keys of the presets checked for multi-size output"""
+        return [key for key, var in self.preset_vars.items() if var.get()]
+        
     def set_dimensions(self, width, height):
         """Set predefined dimensions"""
         self.width_var.set(str(width))
@@ -639,21 +1211,19 @@ class ImageResizerApp:
         file_paths = filedialog.askopenfilenames(
             title="Select images to resize",
             filetypes=[
-                ("All Images", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.webp"),
+                ("All Images", "*.jpg *.jpeg *.png *.bmp *.gif *.tif *.tiff *.webp"),
                 ("JPEG files", "*.jpg *.jpeg"),
                 ("PNG files", "*.png"),
                 ("BMP files", "*.bmp"),
                 ("GIF files", "*.gif"),
-                ("TIFF files", "*.tiff"),
+                ("TIFF files", "*.tif *.tiff"),
                 ("WebP files", "*.webp"),
                 ("All files", "*.*")
             ]
         )
         if file_paths:
             # Add new files to existing selection (avoid duplicates)
-            for file_path in file_paths:
-                if file_path not in self.selected_images:
-                    self.selected_images.append(file_path)
+            self.selected_images.extend(file_paths)
             
             self.update_images_display()
             
@@ -662,39 +1232,92 @@ class ImageResizerApp:
                 directory = os.path.dirname(self.selected_images[0])
                 self.output_path_var.set(directory)
     
+    def open_folder_input(self):
+        """Select a folder and stream its images into the selection"""
+        folder_path = filedialog.askdirectory(title="Select a folder of images to resize")
+        if not folder_path:
+            return
+        
+        self.stop_folder_scan()
+        self.input_folders.append(folder_path)
+        self.folder_scan = TaskFeed(
+            iter_image_files(folder_path, recursive=self.recursive_var.get()),
+            max_pending=10000
+        )
+        
+        # Auto-suggest output location if not set
+        if not self.output_path_var.get().strip():
+            self.output_path_var.set(folder_path)
+        
+        self.selected_count_label.config(text="Scanning folder...")
+        self.root.after(50, self.poll_folder_scan, self.folder_scan)
+    
+    def poll_folder_scan(self, feed, max_items=2000):
+        """Add the files found by the folder scan since the last poll"""
+        if feed is not self.folder_scan:
+            return  # Scan was stopped or replaced
+        
+        done = False
+        try:
+            for _ in range(max_items):
+                path = feed.get(block=False)
+                if path is TaskFeed.DONE:
+                    done = True
+                    break
+                if self.batch_tasks is not None and os.path.abspath(path) in self.batch_planned_outputs:
+                    continue  # Written by the running batch
+                if self.selected_images.add(path) is None:
+                    continue  # Already selected
+                if self.batch_follows_scan:
+                    # Stream into the running batch
+                    self.queue_batch_task(path)
+        except queue.Empty:
+            pass
+        except OSError as e:
+            done = True
+            messagebox.showerror("Error", f"Could not scan the folder:\n{str(e)}")
+        
+        if done:
+            self.stop_folder_scan()
+        self.update_images_display()
+        if not done:
+            count = len(self.selected_images)
+            self.selected_count_label.config(text=f"{count} images selected (scanning...)")
+            self.root.after(100, self.poll_folder_scan, feed)
+    
+    def stop_folder_scan(self):
+        """Stop a folder scan that is still running"""
+        if self.folder_scan is not None:
+            self.folder_scan.close()
+            self.folder_scan = None
+            if self.batch_follows_scan:
+                # No more files will arrive for the running batch
+                self.batch_tasks.put(None)
+                self.batch_follows_scan = False
+    
     def clear_selection(self):
         """Clear all selected images"""
-        self.selected_images = []
+        self.stop_folder_scan()
+        self.selected_images.clear()
+        self.input_folders.clear()
         self.update_images_display()
     
     def remove_selected_image(self):
         """Remove currently selected images from grid"""
-        if self.selected_image_widgets:
-            # Get indices of selected widgets and sort in reverse order
-            indices_to_remove = []
-            for widget in self.selected_image_widgets:
-                if hasattr(widget, 'index') and widget.index < len(self.selected_images):
-                    indices_to_remove.append(widget.index)
-            
-            # Sort in reverse order to avoid index shifting issues
-            indices_to_remove.sort(reverse=True)
-            
-            # Remove images
-            for index in indices_to_remove:
-                if 0 <= index < len(self.selected_images):
-                    self.selected_images.pop(index)
-            
+        if self.selected_preview_ids:
+            self.selected_images.remove(self.selected_preview_ids)
+            self.selected_preview_ids.clear()
             self.update_images_display()
         else:
             messagebox.showinfo("No Selection", "Please click on images to select them for removal.")
     
     def update_images_display(self):
-        """Update the display of selected images with grid layout"""
-        # Clear existing widgets
-        for widget in self.image_preview_widgets:
-            widget.destroy()
-        self.image_preview_widgets.clear()
-        self.selected_image_widgets.clear()
+        """Update the virtualized preview grid to match selected_images"""
+        # Forget removal marks for images that are no longer selected
+        self.selected_preview_ids = {
+            image_id for image_id in self.selected_preview_ids
+            if self.selected_images.has_id(image_id)
+        }
         
         # Update count label
         count = len(self.selected_images)
@@ -705,22 +1328,18 @@ class ImageResizerApp:
         else:
             self.selected_count_label.config(text=f"{count} images selected")
         
-        # Create grid of image previews
-        if self.selected_images:
-            cols = 3  # Number of columns in grid
-            for i, img_path in enumerate(self.selected_images):
-                row = i // cols
-                col = i % cols
-                
-                # Create preview widget
-                preview_widget = self.create_image_preview_widget(img_path, i)
-                preview_widget.grid(row=row, column=col, padx=5, pady=5, sticky='n')
-                
-                self.image_preview_widgets.append(preview_widget)
-        
-        # Update scroll region
-        self.scrollable_frame.update_idletasks()
-        self.image_canvas.configure(scrollregion=self.image_canvas.bbox('all'))
+        # The scroll region covers every row; tiles exist only for rows in view
+        tile_width, tile_height = self.preview_tile_size
+        rows = -(-count // self.preview_columns)
+        self.image_canvas.configure(scrollregion=(
+            0,
+            0,
+            self.preview_columns * (tile_width + self.preview_tile_padding),
+            rows * (tile_height + self.preview_tile_padding)
+        ))
+        if count == 0:
+            self.image_canvas.yview_moveto(0)
+        self.refresh_preview_tiles()
         
         # Validate inputs after updating selection
         self.validate_inputs()
@@ -741,6 +1360,8 @@ class ImageResizerApp:
             input_path = self.selected_images[0]
             initial_dir = os.path.dirname(input_path)
             name, ext = os.path.splitext(os.path.basename(input_path))
+            if self.get_output_format():
+                ext = OUTPUT_FORMATS[self.get_output_format()][1]
             default_filename = f"{name}_resized{ext}"
             
             file_path = filedialog.asksaveasfilename(
@@ -755,6 +1376,7 @@ class ImageResizerApp:
                     ("GIF files", "*.gif"),
                     ("TIFF files", "*.tiff"),
                     ("WebP files", "*.webp"),
+                    ("AVIF files", "*.avif"),
                     ("All files", "*.*")
                 ]
             )
@@ -770,47 +1392,6 @@ class ImageResizerApp:
             if folder_path:
                 self.output_path_var.set(folder_path)
             
-    def resize_image(self, input_path, output_path, width, height):
-        """Resize image with high quality"""
-        try:
-            # Validate input file exists
-            if not os.path.exists(input_path):
-                messagebox.showerror("Error", f"Input file does not exist:\n{input_path}")
-                return False
-            
-            # Ensure output directory exists
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                try:
-                    os.makedirs(output_dir, exist_ok=True)
-                except OSError as e:
-                    messagebox.showerror("Error", f"Cannot create output directory:\n{output_dir}\n\nError: {str(e)}")
-                    return False
-            
-            # Open and resize image
-            with Image.open(input_path) as img:
-                # Use high-quality resampling
-                img_resized = img.resize((width, height), Image.Resampling.LANCZOS)
-                
-                # Save with appropriate quality settings
-                save_kwargs = {'optimize': True}
-                if output_path.lower().endswith(('.jpg', '.jpeg')):
-                    save_kwargs['quality'] = 95
-                elif output_path.lower().endswith('.png'):
-                    save_kwargs['compress_level'] = 6
-                
-                img_resized.save(output_path, **save_kwargs)
-                return True
-                
-        except PermissionError as e:
-            messagebox.showerror("Permission Error", 
-                f"Cannot write to the selected location:\n{output_path}\n\n"
-                f"Error: {str(e)}\n\nPlease choose a different location or run as administrator.")
-            return False
-        except Exception as e:
-            messagebox.showerror("Error", f"Error resizing image:\n{str(e)}")
-            return False
-            
     def resize_action(self):
         """Handle resize button click for batch processing"""
         # Validation
@@ -823,6 +1404,26 @@ class ImageResizerApp:
             messagebox.showerror("Error", "Please choose an output location.")
             return
             
+        name_template = self.name_template_var.get().strip() or DEFAULT_NAME_TEMPLATE
+        presets = self.checked_presets()
+        if presets:
+            # Checked presets take precedence over the custom dimensions
+            try:
+                settings = ResizeSettings(presets=presets, name_template=name_template,
+                                          memory_limit_mb=self.get_memory_limit(),
+                                          encode_profile=self.encode_profile_var.get(),
+                                          output_format=self.get_output_format(),
+                                          fit_mode=self.fit_mode_var.get(),
+                                          smart_crop=self.smart_crop_var.get(),
+                                          upscale=self.upscale_var.get(),
+                                          metadata=self.metadata_var.get(),
+                                          resample_space=self.resample_space_var.get())
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.process_batch_resize(settings, output_path)
+            return
+            
         # Validate dimensions
         try:
             width = int(self.width_var.get().strip())
@@ -834,7 +1435,8 @@ class ImageResizerApp:
             if width > 20000 or height > 20000:
                 result = messagebox.askyesno("Warning", 
                     f"Very large dimensions detected ({width} × {height}).\n"
-                    f"This may take a while and use lots of memory. Continue?")
+                    f"This may take a while. Outputs that do not fit in the memory limit\n"
+                    f"can only be written as PNG. Continue?")
                 if not result:
                     return
                 
@@ -842,96 +1444,220 @@ class ImageResizerApp:
             messagebox.showerror("Error", "Please enter valid dimensions (positive integers).")
             return
         
+        try:
+            settings = ResizeSettings(width, height, name_template=name_template,
+                                      memory_limit_mb=self.get_memory_limit(),
+                                      encode_profile=self.encode_profile_var.get(),
+                                      output_format=self.get_output_format(),
+                                      fit_mode=self.fit_mode_var.get(),
+                                      smart_crop=self.smart_crop_var.get(),
+                                      upscale=self.upscale_var.get(),
+                                      metadata=self.metadata_var.get(),
+                                      resample_space=self.resample_space_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        
         # Start batch processing
-        self.process_batch_resize(width, height, output_path)
+        self.process_batch_resize(settings, output_path)
+    
+    def get_worker_count(self):
+        """Return the configured number of parallel workers"""
+        try:
+            return max(1, int(self.workers_var.get().strip()))
+        except ValueError:
+            return default_worker_count()
     
-    def process_batch_resize(self, width, height, output_location):
-        """Process multiple images with progress tracking"""
-        total_images = len(self.selected_images)
-        successful_resizes = 0
-        failed_resizes = []
+    def get_output_format(self):
+        """Return the OUTPUT_FORMATS key to convert to, or None to keep formats"""
+        choice = self.output_format_var.get()
+        return None if choice == self.keep_format_label else choice.lower()
+    
+    def get_memory_limit(self):
+        """Return the configured per-worker memory limit in MB"""
+        try:
+            return max(16, int(self.memory_limit_var.get().strip()))
+        except ValueError:
+            return DEFAULT_MEMORY_LIMIT_MB
+    
+    def process_batch_resize(self, settings, output_location, input_paths=None, single_file=None):
+        """Start resizing the selected images (or input_paths) on the background worker pool"""
+        if input_paths is None:
+            input_paths = self.selected_images
+            if single_file is None:
+                single_file = (len(self.selected_images) == 1 and self.folder_scan is None
+                               and not os.path.isdir(output_location))
+        
+        # Tasks are streamed through a queue so a folder scan that is still
+        # running keeps feeding the batch; None marks the end of the input
+        self.batch_tasks = queue.Queue()
+        self.batch_task_count = 0
+        self.batch_output_location = output_location
+        self.batch_settings = settings
+        self.batch_planned_outputs = set()
+        for input_path in input_paths:
+            self.queue_batch_task(input_path, single_file)
+        self.batch_follows_scan = input_paths is self.selected_images and self.folder_scan is not None
+        if not self.batch_follows_scan:
+            self.batch_tasks.put(None)
+        tasks = iter(self.batch_tasks.get, None)
+        
+        manifest = None
+        if self.incremental_var.get():
+            manifest = BatchManifest.for_output(output_location, single_file=single_file)
         
         # Show progress section
         self.progress_section_frame.pack(fill='x', pady=(0, 15))
         
         # Disable button during processing
-        original_text = self.resize_button.cget('text')
         self.resize_button.config(
             state='disabled', 
             text="Processing...",
             bg='#666666'
         )
+        self.cancel_button.config(state='normal', text="Cancel")
         
         # Initialize progress
         self.progress_var.set(0)
         self.progress_percent_label.config(text="0%")
         self.progress_label.config(text="Starting batch resize...")
-        self.root.update()
         
+        # A known selection is probed first: largest images first, bombs refused, pool sized to memory
+        self.batch = BatchResizer(tasks, settings, workers=self.get_worker_count(),
+                                  progress_queue=queue.Queue(), manifest=manifest,
+                                  dedup='link' if self.dedup_var.get() else None,
+                                  probe=not self.batch_follows_scan, probe_cache=self.probe_cache)
+        self.batch.start()
+        self.root.after(100, self.poll_batch_progress, settings, output_location, single_file)
+    
+    def queue_batch_task(self, input_path, single_file=False):
+        """Add an image to the running batch"""
+        output_paths = output_paths_for(input_path, self.batch_output_location, self.batch_settings, single_file,
+                                        self.input_folders, self.batch_planned_outputs)
+        self.batch_planned_outputs.update(os.path.abspath(path) for path in output_paths)
+        self.batch_tasks.put((input_path, output_paths))
+        self.batch_task_count += 1
+    
+    def poll_batch_progress(self, settings, output_location, single_file):
+        """Drain progress messages posted by the worker pool"""
+        finished = None
         try:
-            for i, input_path in enumerate(self.selected_images):
-                # Update progress
-                progress_percent = int((i / total_images) * 100)
-                self.progress_var.set(progress_percent)
-                self.progress_percent_label.config(text=f"{progress_percent}%")
-                
-                filename = os.path.basename(input_path)
-                self.progress_label.config(text=f"Processing: {filename} ({i+1}/{total_images})")
-                self.root.update()
-                
-                # Determine output path for this image
-                if total_images == 1 and not os.path.isdir(output_location):
-                    # Single image, specific file path
-                    current_output_path = output_location
-                else:
-                    # Multiple images or folder selected, create filename
-                    name, ext = os.path.splitext(os.path.basename(input_path))
-                    output_filename = f"{name}_resized{ext}"
-                    current_output_path = os.path.join(output_location, output_filename)
-                
-                # Resize image
-                success = self.resize_image(input_path, current_output_path, width, height)
-                
-                if success:
-                    successful_resizes += 1
-                else:
-                    failed_resizes.append(filename)
+            while True:
+                message = self.batch.progress_queue.get_nowait()
+                if message[0] in ('progress', 'skipped'):
+                    done, total, input_path = message[1:4]
+                    filename = os.path.basename(input_path)
+                    if message[0] == 'skipped':
+                        action = "Up to date"
+                    else:
+                        action = "Processed" if message[4] is None else "Failed"
+                    if total is None:
+                        # Still streaming from a folder scan
+                        total = max(self.batch_task_count, done)
+                        self.progress_label.config(text=f"{action}: {filename} ({done}/{total}, scanning...)")
+                    else:
+                        self.progress_label.config(text=f"{action}: {filename} ({done}/{total})")
+                    progress_percent = int((done / total) * 100)
+                    self.progress_var.set(progress_percent)
+                    self.progress_percent_label.config(text=f"{progress_percent}%")
+                elif message[0] == 'finished':
+                    finished = message[1]
+        except queue.Empty:
+            pass
+        
+        if finished is None:
+            self.root.after(100, self.poll_batch_progress, settings, output_location, single_file)
+        else:
+            self.finish_batch_resize(finished, settings, output_location, single_file)
+    
+    def cancel_batch_resize(self):
+        """Cancel the running batch after the files in progress finish"""
+        if self.batch is not None:
+            self.batch.cancel()
+            self.cancel_button.config(state='disabled', text="Cancelling...")
+            self.progress_label.config(text="Cancelling, finishing files in progress...")
+    
+    def finish_batch_resize(self, result, settings, output_location, single_file):
+        """Report the outcome of a finished batch"""
+        self.batch = None
+        self.batch_tasks = None
+        self.batch_follows_scan = False
+        new_sizes = ", ".join(f"{width} × {height}" for _, width, height in settings.targets)
+        encode_summary = (f"Encoded in {result.encode_seconds:.1f} s ({result.encode_profile} profile)\n"
+                          + "".join(line + "\n" for line in summary_lines(result)))
+        self.last_batch_result = result
+        self.export_report_button.pack(anchor='center', pady=(8, 0))
+        successful_resizes = result.successful
+        skipped_resizes = result.skipped
+        failed_resizes = result.failed
+        total_images = result.total
+        
+        try:
+            if result.error is not None:
+                raise RuntimeError(result.error)
             
             # Final progress update
-            self.progress_var.set(100)
-            self.progress_percent_label.config(text="100%")
-            self.progress_label.config(text="Batch resize completed!")
-            self.root.update()
+            if result.cancelled:
+                self.progress_label.config(text="Batch resize cancelled")
+            else:
+                self.progress_var.set(100)
+                self.progress_percent_label.config(text="100%")
+                self.progress_label.config(text="Batch resize completed!")
             
             # Show completion message
-            if failed_resizes:
-                message = f"✅ Batch resize completed!\n\n"
+            if result.cancelled:
+                message = "Batch resize cancelled.\n\n"
+                message += f"Successfully resized: {successful_resizes}/{total_images} images\n"
+                if skipped_resizes:
+                    message += f"Already up to date: {skipped_resizes} images\n"
+                if result.not_written:
+                    message += f"Not written, smaller than every size: {result.not_written} images\n"
+                if failed_resizes:
+                    message += f"Failed: {len(failed_resizes)} images\n"
+                message += "\nOpen the output folder?"
+                
+                result_open = messagebox.askyesno("Batch Resize Cancelled", message)
+            elif failed_resizes:
+                message = "✅ Batch resize completed!\n\n"
                 message += f"Successfully resized: {successful_resizes}/{total_images} images\n"
+                if skipped_resizes:
+                    message += f"Already up to date: {skipped_resizes} images\n"
+                if result.not_written:
+                    message += f"Not written, smaller than every size: {result.not_written} images\n"
                 message += f"Failed: {len(failed_resizes)} images\n"
-                message += f"New Size: {width} × {height} pixels\n\n"
-                message += f"Failed files:\n" + "\n".join(failed_resizes[:5])
-                if len(failed_resizes) > 5:
-                    message += f"\n... and {len(failed_resizes) - 5} more"
-                message += f"\n\nOpen the output folder?"
+                message += f"New Size: {new_sizes} pixels\n"
+                message += encode_summary + "\n"
+                message += "The failed files are listed in the error log.\n\n"
+                message += "Open the output folder?"
                 
-                result = messagebox.askyesno("Batch Resize Completed", message)
+                result_open = messagebox.askyesno("Batch Resize Completed", message)
             else:
-                result = messagebox.askyesno("Success", 
-                    f"✅ All images resized successfully!\n\n"
-                    f"Processed: {successful_resizes} images\n"
-                    f"New Size: {width} × {height} pixels\n\n"
-                    f"Open the output folder?")
+                message = "✅ All images resized successfully!\n\n"
+                message += f"Processed: {successful_resizes} images\n"
+                if skipped_resizes:
+                    message += f"Already up to date: {skipped_resizes} images\n"
+                if result.not_written:
+                    message += f"Not written, smaller than every size: {result.not_written} images\n"
+                message += f"New Size: {new_sizes} pixels\n"
+                message += encode_summary + "\n"
+                message += "Open the output folder?"
+                
+                result_open = messagebox.askyesno("Success", message)
             
-            if result:
+            if result_open:
                 # Open output folder
-                if total_images == 1 and not os.path.isdir(output_location):
+                if single_file:
                     folder_path = os.path.dirname(output_location)
                 else:
                     folder_path = output_location
                 self.open_folder(folder_path)
             
+            # Every failure is listed once, after the batch, so batches run unattended
+            if failed_resizes:
+                self.show_error_log(failed_resizes, settings, output_location, single_file)
+            
             # Clear selection automatically after successful batch resize
-            if successful_resizes > 0:
+            if successful_resizes + skipped_resizes + result.not_written > 0 and not result.cancelled:
                 self.clear_selection()
                 
         except Exception as e:
@@ -941,12 +1667,102 @@ class ImageResizerApp:
             # Re-enable button and hide progress
             self.resize_button.config(
                 state='normal', 
-                text=original_text,
+                text="Resize Images",
                 bg=self.colors['success']
             )
             # Keep progress visible for a moment, then hide
             self.root.after(3000, self.progress_section_frame.pack_forget)
     
+    def show_error_log(self, errors, settings, output_location, single_file):
+        """List the files a batch could not resize, with an action to retry only those"""
+        log = tk.Toplevel(self.root)
+        log.title(f"Error log - {len(errors)} failed images")
+        log.geometry("760x360")
+        log.configure(bg=self.colors['bg'])
+        log.transient(self.root)
+        
+        table_frame = tk.Frame(log, bg=self.colors['bg'])
+        table_frame.pack(fill='both', expand=True, padx=15, pady=(15, 10))
+        
+        table = ttk.Treeview(table_frame, columns=('file', 'stage', 'error'), show='headings')
+        for column, title, width in (('file', "File", 200), ('stage', "Stage", 80), ('error', "Error", 440)):
+            table.heading(column, text=title)
+            table.column(column, width=width, stretch=column == 'error')
+        for error in errors:
+            table.insert('', 'end', values=(os.path.basename(error.path), error.stage,
+                                             f"{error.error_type}: {error.message}"))
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=table.yview)
+        table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        table.pack(side='left', fill='both', expand=True)
+        
+        button_frame = tk.Frame(log, bg=self.colors['bg'])
+        button_frame.pack(fill='x', padx=15, pady=(0, 15))
+        
+        def retry():
+            if self.batch is not None:
+                messagebox.showinfo("Batch running", "Wait for the current batch to finish first.", parent=log)
+                return
+            log.destroy()
+            self.process_batch_resize(settings, output_location,
+                                      input_paths=[error.path for error in errors], single_file=single_file)
+        
+        retry_button = tk.Button(
+            button_frame,
+            text="Retry failed",
+            command=retry,
+            font=('Segoe UI', 10, 'bold'),
+            bg=self.colors['primary'],
+            fg=self.colors['text'],
+            relief='flat',
+            bd=0,
+            padx=15,
+            pady=6,
+            cursor='hand2'
+        )
+        retry_button.pack(side='left')
+        
+        close_button = tk.Button(
+            button_frame,
+            text="Close",
+            command=log.destroy,
+            font=('Segoe UI', 10),
+            bg=self.colors['surface'],
+            fg=self.colors['text'],
+            relief='flat',
+            bd=0,
+            padx=15,
+            pady=6,
+            cursor='hand2'
+        )
+        close_button.pack(side='right')
+    
+    def export_batch_report(self):
+        """Save the per-file timings of the last batch as JSON or CSV"""
+        if self.last_batch_result is None:
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="Export performance report",
+            defaultextension=".json",
+            initialfile="resize_report.json",
+            filetypes=[("JSON report", "*.json"), ("CSV, one row per image", "*.csv")]
+        )
+        if not file_path:
+            return
+        try:
+            write_report(self.last_batch_result, file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the report:\n{e}")
+    
+    def on_close(self):
+        """Stop background work and close the window"""
+        if self.batch is not None:
+            self.batch.cancel()
+        self.stop_folder_scan()
+        self.thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+        self.probe_cache.save()
+        self.root.destroy()
+    
     def open_folder(self, folder_path):
         """Open folder in file explorer (cross-platform)"""
         import subprocess
@@ -965,6 +1781,11 @@ class ImageResizerApp:
                 f"Could not open folder automatically: {str(e)}")
 
 def main():
+    """Start the Tk front end"""
+    if tk is None:
+        sys.exit("Tkinter is not available. Run 'python -m image_resizer --help' "
+                 "to use the command line instead.")
+    
     root = tk.Tk()
     
     # Set window icon (optional)
@@ -991,4 +1812,10 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Needed for the worker pool in the frozen (PyInstaller) executable
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        # Any arguments select the headless command line
+        import resize_cli
+        sys.exit(resize_cli.main())
     main()
\ No newline at end of file
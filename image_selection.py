@@ -0,0 +1,97 @@
+"""
+Ordered, duplicate-free selection of image paths.
+
+Every added image gets a stable id that never changes while it stays
+selected, so widgets can refer to images by id instead of by position.
+Adding, membership tests and removal are O(1); positional access (used by
+the virtualized preview grid) compacts the order lazily after removals.
+"""
+import itertools
+
+from resize_engine import path_key
+
+
+class ImageSelection:
+    """Ordered set of image paths with stable ids"""
+
+    def __init__(self, paths=()):
+        self._paths = {}  # id -> path, in insertion order
+        self._keys = {}  # id -> identity key
+        self._ids_by_key = {}  # identity key -> id
+        self._order = []  # ids by position, may contain removed ids
+        self._order_dirty = False
+        self._next_id = itertools.count(1)
+        self.extend(paths)
+
+    def add(self, path):
+        """Add path and return its new id, or None if the file is already selected"""
+        key = path_key(path)
+        if key in self._ids_by_key:
+            return None
+        image_id = next(self._next_id)
+        self._paths[image_id] = path
+        self._keys[image_id] = key
+        self._ids_by_key[key] = image_id
+        self._order.append(image_id)
+        return image_id
+
+    def extend(self, paths):
+        """Add several paths, returning the ids of those that were new"""
+        new_ids = []
+        for path in paths:
+            image_id = self.add(path)
+            if image_id is not None:
+                new_ids.append(image_id)
+        return new_ids
+
+    def remove(self, image_ids):
+        """Remove images by id, returning how many were removed"""
+        removed = 0
+        for image_id in image_ids:
+            if self._paths.pop(image_id, None) is not None:
+                del self._ids_by_key[self._keys.pop(image_id)]
+                removed += 1
+        if removed:
+            self._order_dirty = True
+        return removed
+
+    def clear(self):
+        """Remove every image"""
+        self._paths.clear()
+        self._keys.clear()
+        self._ids_by_key.clear()
+        self._order = []
+        self._order_dirty = False
+
+    def path(self, image_id):
+        """Path of the image with the given id"""
+        return self._paths[image_id]
+
+    def has_id(self, image_id):
+        return image_id in self._paths
+
+    def ids(self, start=0, stop=None):
+        """Ids of the images at positions start to stop"""
+        return self._compacted_order()[start:stop]
+
+    def __getitem__(self, position):
+        """Path (or list of paths for a slice) at a position"""
+        order = self._compacted_order()
+        if isinstance(position, slice):
+            return [self._paths[image_id] for image_id in order[position]]
+        return self._paths[order[position]]
+
+    def __contains__(self, path):
+        return path_key(path) in self._ids_by_key
+
+    def __iter__(self):
+        return iter(list(self._paths.values()))
+
+    def __len__(self):
+        return len(self._paths)
+
+    def _compacted_order(self):
+        if self._order_dirty:
+            self._order = [image_id for image_id in self._order if image_id in self._paths]
+            self._order_dirty = False
+        return self._order
@@ -0,0 +1,282 @@
+"""
+Memory-bounded resizing for images too large to decode in one piece.
+
+Archive scans can be tens of thousands of pixels on a side, far more than
+fits in memory once decoded (Pillow keeps RGB at 4 bytes per pixel). When a
+source is stored uncompressed (TIFF, BMP, PPM, ...) the decoder is pointed
+at one band of rows at a time, and each output strip is resampled from only
+the source rows under its filter window. Peak memory then depends on the
+image width and the memory limit, not on the image area. Very large PNG
+outputs are also written strip by strip.
+
+Compressed sources (PNG, LZW/Deflate TIFF, WebP) can only be decoded whole by
+Pillow; they are refused with a clear error when they do not fit.
+"""
+import io
+import math
+import struct
+import threading
+import time
+import zlib
+
+from PIL import ExifTags, Image
+
+# Lanczos reads 3 source pixels either side of a sample (more when shrinking)
+LANCZOS_SUPPORT = 3
+
+# Bits per pixel of the raw layouts whose row stride Pillow leaves implicit
+RAW_BITS = {
+    '1': 1, 'L': 8, 'P': 8, 'LA': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'RGBX': 32, 'BGRA': 32, 'BGRX': 32, 'CMYK': 32,
+    'I;16': 16, 'I;16B': 16, 'I;16L': 16, 'I': 32, 'F': 32,
+    'RGB;16B': 48, 'RGB;16L': 48, 'RGBA;16B': 64, 'RGBA;16L': 64,
+}
+
+MB = 1024 * 1024
+
+# Serializes the swap of the global Image.MAX_IMAGE_PIXELS in open_unchecked
+_UNCHECKED_OPEN_LOCK = threading.Lock()
+
+
+def open_unchecked(path):
+    """Open path without Pillow's decompression-bomb check.
+
+    The memory limit takes over that job: images are only decoded whole when
+    they fit in it and in bands otherwise, so oversized files are refused
+    before any pixels are decoded. Safe to call from several threads:
+    Image.open only reads the header, so the lock is held briefly.
+    """
+    with _UNCHECKED_OPEN_LOCK:
+        limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            return Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def _pillow_orients_tiff():
+    """Check whether this Pillow turns TIFF images upright itself when it loads them"""
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    Image.new('L', (2, 1)).save(buffer, format='TIFF', exif=exif)
+    with Image.open(buffer) as img:
+        return img.size == (1, 2)
+
+
+# Newer Pillow releases report TIFF images upright and transpose them on load
+PILLOW_ORIENTS_TIFF = _pillow_orients_tiff()
+
+
+def decoder_orientation(img):
+    """EXIF orientation that Pillow applies itself when loading an opened image, else 1"""
+    if img.format == 'TIFF' and PILLOW_ORIENTS_TIFF:
+        return img.tag_v2.get(ExifTags.Base.Orientation, 1)
+    return 1
+
+
+def pixel_bytes(mode):
+    """Bytes Pillow uses in memory for one pixel of mode"""
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def decoded_bytes(size, mode):
+    """Memory needed to hold an image of size and mode"""
+    return size[0] * size[1] * pixel_bytes(mode)
+
+
+def raw_pieces(tiles, width, height):
+    """Uncompressed blocks of an opened image as (box, offset, rawmode, stride, ystep).
+
+    Returns None when any part of the image is compressed, because those
+    streams can only be decoded from the start.
+    """
+    pieces = []
+    for codec, extents, offset, args in tiles:
+        if codec != 'raw':
+            return None
+        x0, y0, x1, y1 = extents
+        args = args if isinstance(args, tuple) else (args,)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        ystep = args[2] if len(args) > 2 else 1
+        if not stride:
+            if rawmode not in RAW_BITS:
+                return None
+            stride = (RAW_BITS[rawmode] * (x1 - x0) + 7) // 8
+        pieces.append(((x0, y0, x1, y1), offset, rawmode, stride, ystep))
+    if not pieces or sum((x1 - x0) * (y1 - y0) for (x0, y0, x1, y1), *_ in pieces) != width * height:
+        return None
+    return pieces
+
+
+def band_pieces(pieces, top, bottom):
+    """Blocks covering source rows top to bottom, moved to start at row 0 of the band.
+
+    Returns (top, bottom, pieces); the band grows to whole strips or tiles,
+    while a single block covering the image is cut down to just the band.
+    """
+    if len(pieces) == 1:
+        (x0, _, x1, y1), offset, rawmode, stride, ystep = pieces[0]
+        # Bottom-up files (BMP) store the last row of the band first
+        first_row = top if ystep > 0 else y1 - bottom
+        return top, bottom, [((x0, 0, x1, bottom - top), offset + first_row * stride, rawmode, stride, ystep)]
+
+    while True:
+        selected = [piece for piece in pieces if piece[0][1] < bottom and piece[0][3] > top]
+        grown = (min(piece[0][1] for piece in selected), max(piece[0][3] for piece in selected))
+        if grown == (top, bottom):
+            break
+        top, bottom = grown
+    return top, bottom, [
+        ((x0, y0 - top, x1, y1 - top), offset, rawmode, stride, ystep)
+        for (x0, y0, x1, y1), offset, rawmode, stride, ystep in selected
+    ]
+
+
+def can_decode_in_bands(img):
+    """Check whether an opened (not yet loaded) image can be decoded a band at a time"""
+    # Bands are read as stored, so images Pillow turns upright on load are decoded whole
+    return decoder_orientation(img) == 1 and raw_pieces(img.tile, img.width, img.height) is not None
+
+
+def load_band(path, mode, size, pieces, palette=None):
+    """Read only the given uncompressed blocks of path into an image of size.
+
+    palette is (data, rawmode) for 'P' images.
+    """
+    band = None
+    with open(path, 'rb') as fp:
+        for (x0, y0, x1, y1), offset, rawmode, stride, ystep in pieces:
+            fp.seek(offset)
+            data = fp.read(stride * (y1 - y0))
+            piece = Image.frombytes(mode, (x1 - x0, y1 - y0), data, 'raw', rawmode, stride, ystep)
+            del data
+            if len(pieces) == 1:
+                band = piece
+            else:
+                if band is None:
+                    band = Image.new(mode, size)
+                band.paste(piece, (x0, y0))
+    if palette is not None:
+        band.putpalette(*palette)
+    return band
+
+
+def iter_resized_strips(path, size, memory_limit, prepare=None, box=None, timings=None, resample=None,
+                        resample_pixel_bytes=0):
+    """Yield (top, strip) pieces of path (or its box region) resized to size, one band at a time.
+
+    memory_limit is the number of bytes the decoded band and its resampling
+    buffers may use. prepare, if given, converts each band before it is
+    resampled (e.g. expanding a palette). resample, if given, replaces the
+    Lanczos Image.resize, called as resample(band, size, box), and needs
+    resample_pixel_bytes more memory per band pixel. When timings
+    is a dict, the seconds spent reading and decoding bands and resampling
+    them are added to its 'decode' and 'resample' entries. Raises
+    MemoryError when not even one output row fits.
+    """
+    with open_unchecked(path) as img:
+        width, height = img.size
+        mode = img.mode
+        pieces = raw_pieces(img.tile, width, height)
+        # Palettes may still be in file order (e.g. BGRX for BMP); keep them raw
+        palette = None
+        if mode == 'P' and img.palette is not None:
+            palette = (bytes(img.palette.palette), img.palette.rawmode or img.palette.mode)
+    if pieces is None:
+        raise MemoryError(f"{width} × {height} image is compressed and cannot be decoded in strips")
+
+    left, box_top, right, box_bottom = box or (0, 0, width, height)
+    scale = (box_bottom - box_top) / size[1]
+    margin = math.ceil(LANCZOS_SUPPORT * max(scale, 1.0)) + 1
+    piece_rows = max(y1 - y0 for (_, y0, _, y1), *_ in pieces) if len(pieces) > 1 else 0
+
+    # A band row is held as file data, decoded, and once more after the horizontal
+    # pass; prepare may convert it to a mode of up to 4 bytes per pixel on top
+    work_bytes = pixel_bytes(mode) if prepare is None else max(pixel_bytes(mode), 4)
+    row_bytes = (width * (pixel_bytes(mode) * 2 + (work_bytes if prepare else 0) + resample_pixel_bytes)
+                 + size[0] * work_bytes)
+    band_rows = memory_limit // row_bytes - 2 * piece_rows
+    strip_rows = min(size[1], int((band_rows - 2 * margin) / scale))
+    if strip_rows < 1:
+        raise MemoryError(f"{width} × {height} image is too wide to resize within the memory limit")
+
+    for top in range(0, size[1], strip_rows):
+        start = time.perf_counter()
+        bottom = min(top + strip_rows, size[1])
+        source_top = box_top + top * (box_bottom - box_top) / size[1]
+        source_bottom = box_top + bottom * (box_bottom - box_top) / size[1]
+        band_top, band_bottom, band = band_pieces(pieces,
+                                                  max(0, math.floor(source_top) - margin),
+                                                  min(height, math.ceil(source_bottom) + margin))
+        source = load_band(path, mode, (width, band_bottom - band_top), band, palette)
+        if prepare is not None:
+            source = prepare(source)
+        decoded = time.perf_counter()
+
+        # Rows outside the box but inside the band feed the filter edges, so the
+        # strips join up exactly as if the whole image had been resized at once.
+        # No reducing_gap: reduce() would align its grid to each band, not the image.
+        strip_box = (left, source_top - band_top, right, source_bottom - band_top)
+        if resample is None:
+            strip = source.resize((size[0], bottom - top), Image.Resampling.LANCZOS, box=strip_box)
+        else:
+            strip = resample(source, (size[0], bottom - top), strip_box)
+        del source
+        if timings is not None:
+            timings['decode'] += decoded - start
+            timings['resample'] += time.perf_counter() - decoded
+        yield top, strip
+
+
+class PNGStripWriter:
+    """Write a PNG one strip of rows at a time (unfiltered rows, zlib compression)"""
+
+    COLOR_TYPES = {'L': (0, 8), 'I;16': (0, 16), 'LA': (4, 8), 'RGB': (2, 8), 'RGBA': (6, 8)}
+
+    def __init__(self, path, size, mode, compress_level=6):
+        self.size = size
+        self.mode = self.writable_mode(mode)
+        color_type, bit_depth = self.COLOR_TYPES[self.mode]
+        self.compressor = zlib.compressobj(compress_level)
+        self.file = open(path, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], bit_depth, color_type, 0, 0, 0))
+
+    @classmethod
+    def writable_mode(cls, mode):
+        """Closest mode the writer can store for an image of mode"""
+        if mode in cls.COLOR_TYPES:
+            return mode
+        if mode in ('1', 'I;16B', 'I;16L'):
+            return 'L' if mode == '1' else 'I;16'
+        return 'RGBA' if mode in ('P', 'PA') else 'RGB'
+
+    def write(self, strip):
+        """Append the rows of strip below the rows written so far"""
+        if strip.mode != self.mode:
+            strip = strip.convert(self.mode)
+        raw = strip.tobytes('raw', 'I;16B') if self.mode == 'I;16' else strip.tobytes()
+        row_bytes = len(raw) // strip.height
+        rows = b''.join(b'\x00' + raw[i:i + row_bytes] for i in range(0, len(raw), row_bytes))
+        self._chunk(b'IDAT', self.compressor.compress(rows))
+
+    def close(self):
+        """Finish the image data and close the file"""
+        try:
+            self._chunk(b'IDAT', self.compressor.flush())
+            self._chunk(b'IEND', b'')
+        finally:
+            self.file.close()
+
+    def _chunk(self, kind, data):
+        if kind == b'IDAT' and not data:
+            return
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data)))
@@ -0,0 +1,114 @@
+"""
+High-fidelity resampling in floating point with premultiplied alpha and
+optionally in linear light.
+
+Pillow resamples 8-bit pixels as stored. Colors are gamma encoded (sRGB),
+so averaging them darkens fine detail such as thin bright lines, and
+although RGBA is premultiplied before resampling, it is premultiplied in
+8 bits: the colors of nearly transparent pixels are rounded away, leaving
+dark or banded fringes around soft edges once the result is composited.
+
+Here every channel goes through a NumPy lookup table into float32 (decoding
+sRGB to linear light when asked), the colors are multiplied by alpha,
+and each channel is resampled as a Pillow 'F' image with the same Lanczos
+filter, box and reducing gap as the standard path. The results are divided
+by the resampled alpha and encoded back to 8 bits through a second table.
+
+NumPy is optional; without it only the standard path is available.
+"""
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# Modes resampled in floating point; others always use the standard path
+FLOAT_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# Float32 planes held at once per source pixel: one color channel and the
+# 'F' image Pillow resamples it from, plus alpha for modes that have it
+SOURCE_FLOAT_PLANES = 2
+# and per output pixel: resampled alpha and the channel being encoded with
+# its temporaries (divided, clipped, scaled)
+OUTPUT_FLOAT_PLANES = 4
+
+# Resampled alpha below half an 8-bit step is transparent; its color is dropped
+MIN_ALPHA = 0.5 / 255
+
+# Steps of the table encoding linear values back to 8-bit sRGB
+ENCODE_STEPS = 65535
+
+
+def _srgb_to_linear(values):
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(values):
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+
+
+if HAVE_NUMPY:
+    # 8-bit value -> float, as stored or decoded to linear light
+    UNIT_LUT = (np.arange(256) / 255).astype(np.float32)
+    LINEAR_LUT = _srgb_to_linear(np.arange(256) / 255).astype(np.float32)
+    # Linear value in ENCODE_STEPS steps -> 8-bit sRGB; fine enough that the
+    # darkest levels, where sRGB is steepest, still round correctly
+    ENCODE_LUT = np.rint(_linear_to_srgb(np.arange(ENCODE_STEPS + 1) / ENCODE_STEPS) * 255).astype(np.uint8)
+
+
+def source_pixel_bytes(mode):
+    """Memory resample_float needs per source pixel of mode: its NumPy copy and the float planes"""
+    planes = SOURCE_FLOAT_PLANES + mode.endswith('A')
+    return Image.getmodebands(mode) + planes * 4
+
+
+def work_bytes(size, mode, output_size=(0, 0)):
+    """Extra memory resample_float needs for a source of size and mode resampled to output_size"""
+    output_pixel_bytes = Image.getmodebands(mode) + OUTPUT_FLOAT_PLANES * 4
+    return size[0] * size[1] * source_pixel_bytes(mode) + output_size[0] * output_size[1] * output_pixel_bytes
+
+
+def _resample_plane(plane, size, box, reducing_gap):
+    resized = Image.fromarray(plane).resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=reducing_gap)
+    return np.asarray(resized)
+
+
+def resample_float(img, size, box=None, reducing_gap=None, linear=True):
+    """Lanczos resample an 'L', 'LA', 'RGB' or 'RGBA' image (or its box region) to size in float32.
+
+    Colors are premultiplied by alpha, and with linear also decoded from
+    sRGB to linear light, before resampling; the result has the mode of img.
+    """
+    pixels = np.asarray(img)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    has_alpha = img.mode.endswith('A')
+    colors = pixels.shape[2] - 1 if has_alpha else pixels.shape[2]
+    decode = LINEAR_LUT if linear else UNIT_LUT
+
+    alpha = resized_alpha = None
+    if has_alpha:
+        alpha = UNIT_LUT[pixels[:, :, -1]]
+        resized_alpha = np.clip(_resample_plane(alpha, size, box, reducing_gap), 0.0, 1.0)
+        opaque = resized_alpha >= MIN_ALPHA
+
+    result = np.empty((size[1], size[0], pixels.shape[2]), np.uint8)
+    for channel in range(colors):
+        plane = decode[pixels[:, :, channel]]
+        if alpha is not None:
+            plane *= alpha
+        plane = _resample_plane(plane, size, box, reducing_gap)
+        if alpha is not None:
+            plane = np.divide(plane, resized_alpha, out=np.zeros_like(plane), where=opaque)
+        plane = np.clip(plane, 0.0, 1.0)
+        if linear:
+            result[:, :, channel] = ENCODE_LUT[np.rint(plane * ENCODE_STEPS).astype(np.uint16)]
+        else:
+            result[:, :, channel] = np.rint(plane * 255)
+    if alpha is not None:
+        result[:, :, -1] = np.rint(resized_alpha * 255)
+
+    return Image.fromarray(result[:, :, 0] if pixels.shape[2] == 1 else result)
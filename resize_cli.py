@@ -0,0 +1,265 @@
+"""
+Command line front end for Image Resizer Pro.
+
+Runs the same resize engine as the GUI without importing Tk, so batches can
+run on build servers and in scheduled jobs:
+
+    python -m image_resizer photos/*.jpg --preset product -o out/ --jobs 8
+    python -m image_resizer photos/ --preset hero --preset product -o out/
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+
+from batch_manifest import BatchManifest
+from batch_report import summary_lines, write_report
+from image_probe import ProbeCache
+from resize_engine import (
+    DEFAULT_ENCODE_PROFILE,
+    DEFAULT_FIT_MODE,
+    DEFAULT_MEMORY_LIMIT_MB,
+    DEFAULT_METADATA,
+    DEFAULT_NAME_TEMPLATE,
+    DEFAULT_PREFETCH,
+    DEFAULT_RESAMPLE_SPACE,
+    DEFAULT_UPSCALE,
+    DEFAULT_WRITE_QUEUE,
+    ENCODE_PROFILES,
+    FIT_MODES,
+    METADATA_POLICIES,
+    PRESETS,
+    RESAMPLE_SPACES,
+    UPSCALE_POLICIES,
+    BatchResizer,
+    ResizeSettings,
+    available_output_formats,
+    default_worker_count,
+    iter_inputs,
+    plan_tasks,
+)
+from thumbnail_cache import user_cache_dir
+
+
+def positive_int(value):
+    """argparse type for strictly positive integers"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value!r}")
+    return number
+
+
+def non_negative_int(value):
+    """argparse type for integers of 0 or more"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value!r}")
+    return number
+
+
+def build_parser():
+    """Create the argument parser for the command line"""
+    parser = argparse.ArgumentParser(
+        prog='image_resizer',
+        description="Resize images without the GUI. Run with no arguments to open the GUI.",
+    )
+    parser.add_argument(
+        'inputs', nargs='+', metavar='INPUT',
+        help="image files, directories or glob patterns (quote patterns using **)")
+    parser.add_argument(
+        '-r', '--recursive', action='store_true',
+        help="also resize images in subfolders of INPUT directories")
+    parser.add_argument(
+        '-o', '--output', required=True,
+        help="folder the resized images are written to")
+    parser.add_argument('--width', type=positive_int, help="target width in pixels")
+    parser.add_argument('--height', type=positive_int, help="target height in pixels")
+    parser.add_argument(
+        '--preset', choices=sorted(PRESETS), action='append', dest='presets',
+        help="use a built-in size preset instead of --width/--height; repeat to "
+             "write several sizes from a single decode of each image")
+    parser.add_argument(
+        '--mode', dest='fit_mode', choices=FIT_MODES, default=DEFAULT_FIT_MODE,
+        help="stretch to the exact size, fit inside it, fill it and crop the overflow, "
+             "or fit and pad to the exact size (default: %(default)s)")
+    parser.add_argument(
+        '--smart-crop', action='store_true',
+        help="with --mode fill, crop to the most detailed part instead of the center")
+    parser.add_argument(
+        '--upscale', choices=UPSCALE_POLICIES, default=DEFAULT_UPSCALE,
+        help="images smaller than the target: enlarge them, skip that size, or copy the "
+             "source as it is (default: %(default)s); sources already at the target size "
+             "are always copied without re-encoding")
+    parser.add_argument(
+        '--resample-space', choices=RESAMPLE_SPACES, default=DEFAULT_RESAMPLE_SPACE,
+        help="resample 8-bit values as stored, in float with premultiplied alpha (no dark "
+             "fringes around transparent edges), or also in linear light so fine detail keeps "
+             "its brightness; the last two need NumPy and are slower (default: %(default)s)")
+    parser.add_argument(
+        '--name-template', default=DEFAULT_NAME_TEMPLATE,
+        help="output file name; fields {name}, {ext}, {preset}, {width}, {height} "
+             "(default: %(default)s, where {preset} is 'resized' for --width/--height)")
+    parser.add_argument(
+        '-j', '--jobs', type=positive_int, default=default_worker_count(),
+        help="number of worker processes (default: number of CPU cores)")
+    parser.add_argument(
+        '--no-draft', dest='draft', action='store_false',
+        help="always decode and resample at full resolution (slower, for comparisons)")
+    parser.add_argument(
+        '--format', dest='output_format', choices=available_output_formats(),
+        help="convert every image to this format (default: keep each input's format); "
+             "transparency is flattened onto white for JPEG")
+    parser.add_argument(
+        '--metadata', choices=METADATA_POLICIES, default=DEFAULT_METADATA,
+        help="metadata written to the outputs: keep EXIF, ICC profile and XMP, keep only the "
+             "icc color profile, or strip everything for the smallest files (default: %(default)s); "
+             "images are always turned upright for their EXIF orientation")
+    parser.add_argument(
+        '--encode-profile', choices=list(ENCODE_PROFILES), default=DEFAULT_ENCODE_PROFILE,
+        help="encoder effort: fast, balanced or smallest files at the same quality "
+             "(default: %(default)s)")
+    parser.add_argument(
+        '--memory-limit', type=positive_int, default=DEFAULT_MEMORY_LIMIT_MB, metavar='MB',
+        help="memory each worker may use for one image; larger uncompressed images are "
+             "decoded in strips (default: %(default)s)")
+    parser.add_argument(
+        '--prefetch', type=non_negative_int, default=DEFAULT_PREFETCH, metavar='N',
+        help="source files read ahead of the workers, so slow (network) disks and the CPU "
+             "work overlap; the data read ahead, including files waiting for a worker, stays "
+             "within --memory-limit in total; 0 lets each worker read its own file "
+             "(default: %(default)s)")
+    parser.add_argument(
+        '--write-queue', type=non_negative_int, default=DEFAULT_WRITE_QUEUE, metavar='N',
+        help="encoded images that may wait for the background writer; 0 lets each worker "
+             "write its own outputs (default: %(default)s)")
+    parser.add_argument(
+        '--dedup', choices=('link', 'copy'),
+        help="resize byte-identical inputs once and hardlink (or copy) the outputs for the "
+             "other copies; inputs are only hashed when their sizes match")
+    parser.add_argument(
+        '--probe', action='store_true',
+        help="read every input's header first: resize the largest images first, refuse "
+             "decompression bombs and start no more workers than the free memory holds "
+             "(waits for the input scan to finish)")
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help="skip images whose output is up to date according to the manifest in the "
+             "output folder (also resumes interrupted runs)")
+    parser.add_argument(
+        '--hash', action='store_true',
+        help="with --incremental, compare file contents when a source's mtime changed")
+    parser.add_argument(
+        '--report', metavar='FILE',
+        help="write per-file stage timings, bytes and memory use to FILE "
+             "(CSV when it ends in .csv, JSON otherwise)")
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help="only print errors and the final summary")
+    return parser
+
+
+def main(argv=None):
+    """Run the command line and return the process exit code"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.presets:
+        if args.width or args.height:
+            parser.error("--preset cannot be combined with --width/--height")
+        presets = list(dict.fromkeys(args.presets))
+    elif args.width and args.height:
+        presets = ()
+    else:
+        parser.error("either --preset or both --width and --height are required")
+
+    try:
+        settings = ResizeSettings(args.width, args.height, draft=args.draft, presets=presets,
+                                  name_template=args.name_template, memory_limit_mb=args.memory_limit,
+                                  encode_profile=args.encode_profile, output_format=args.output_format,
+                                  fit_mode=args.fit_mode, smart_crop=args.smart_crop,
+                                  upscale=args.upscale, metadata=args.metadata,
+                                  resample_space=args.resample_space)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if os.path.exists(args.output) and not os.path.isdir(args.output):
+        parser.error(f"output is not a folder: {args.output}")
+    os.makedirs(args.output, exist_ok=True)
+
+    # Inputs are scanned lazily, so resizing starts while big folders are still being listed
+    # Subfolders of scanned folders are mirrored in the output folder
+    roots = [path for path in args.inputs if os.path.isdir(path)]
+    tasks = plan_tasks(iter_inputs(args.inputs, recursive=args.recursive), args.output, settings, roots)
+    manifest = BatchManifest.for_output(args.output, use_hash=args.hash) if args.incremental else None
+    probe_cache = ProbeCache(os.path.join(user_cache_dir(), 'probe_cache.json')) if args.probe else None
+    batch = BatchResizer(tasks, settings, workers=args.jobs, manifest=manifest,
+                         prefetch=args.prefetch, write_queue=args.write_queue, dedup=args.dedup,
+                         probe=args.probe, probe_cache=probe_cache)
+    batch.start()
+
+    finished = None
+    while finished is None:
+        try:
+            message = batch.progress_queue.get()
+        except KeyboardInterrupt:
+            # Let the files in progress finish, then report
+            print("Cancelling...", file=sys.stderr)
+            batch.cancel()
+            continue
+        if message[0] == 'progress':
+            _, done, total, input_path, error = message
+            total = '?' if total is None else total
+            if error is not None:
+                print(f"[{done}/{total}] FAILED {input_path}: {error}", file=sys.stderr)
+            elif not args.quiet:
+                print(f"[{done}/{total}] {input_path}")
+        elif message[0] == 'skipped':
+            _, done, total, input_path = message
+            if not args.quiet:
+                print(f"[{done}/{'?' if total is None else total}] up to date {input_path}")
+        elif message[0] == 'finished':
+            finished = message[1]
+
+    if finished.error is not None:
+        print(f"Batch failed: {finished.error}", file=sys.stderr)
+        return 1
+    if finished.total == 0:
+        print("No images matched the given inputs", file=sys.stderr)
+        return 2
+    sizes = ", ".join(f"{width} × {height}" for _, width, height in settings.targets)
+    print(f"Resized {finished.successful}/{finished.total} images to {sizes} in {args.output}")
+    if finished.successful:
+        print(f"Wrote {finished.bytes_written / (1024 * 1024):.1f} MB, {finished.encode_seconds:.2f} s "
+              f"encoding with the {finished.encode_profile} profile")
+        if not args.quiet:
+            for line in summary_lines(finished):
+                print(line)
+    if args.report:
+        try:
+            write_report(finished, args.report)
+        except OSError as e:
+            print(f"Cannot write report {args.report}: {e}", file=sys.stderr)
+    if finished.skipped:
+        print(f"Skipped {finished.skipped} images that were already up to date")
+    if finished.not_written:
+        print(f"Left {finished.not_written} images without output: smaller than every target (--upscale skip)")
+    if finished.cancelled:
+        print("Batch was cancelled", file=sys.stderr)
+        return 130
+    if finished.failed:
+        stages = Counter(error.stage for error in finished.failed)
+        print(f"Failed: {len(finished.failed)} images ("
+              + ", ".join(f"{count} during {stage}" for stage, count in stages.most_common()) + ")",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
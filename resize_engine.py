@@ -0,0 +1,1801 @@
+"""
+Resize engine for Image Resizer Pro.
+
+Holds everything that does not need a display: the built-in presets, input
+expansion and the Pillow decode/resize/encode work. Batches run on a pool of
+worker processes so every core is used and the Tk main loop never blocks.
+Progress is reported through a thread-safe queue that the GUI polls with
+root.after and the command line prints.
+"""
+import functools
+import glob
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from PIL import ExifTags, Image, ImageFilter, UnidentifiedImageError, features
+
+from batch_manifest import file_sha256
+from batch_report import STAGES, add_time, new_file_stats, peak_rss_bytes
+from image_probe import exif_orientation, probe_images, read_exif, suggest_workers
+from large_image import (
+    MB,
+    PNGStripWriter,
+    can_decode_in_bands,
+    decoded_bytes,
+    iter_resized_strips,
+    open_unchecked,
+)
+from linear_light import FLOAT_MODES, HAVE_NUMPY, resample_float, source_pixel_bytes, work_bytes
+
+
+# Built-in size presets: key -> (display name, width, height)
+PRESETS = {
+    'hero': ("Hero", 1259, 1008),
+    'product': ("Product", 390, 450),
+    'hero-image': ("Hero Image", 1600, 500),
+}
+
+SUPPORTED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+
+
+def is_supported_image(path):
+    """Check whether path has one of the supported image extensions"""
+    return path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def path_key(path):
+    """Identity of the file at path for duplicate detection.
+
+    The same file reached through a symlink, a relative path or different
+    letter case on a case-insensitive file system gives the same key.
+    """
+    try:
+        stat = os.stat(path)
+        if stat.st_ino:
+            return (stat.st_dev, stat.st_ino)
+    except OSError:
+        pass
+    # No usable file id (missing file or some network shares)
+    return os.path.normcase(os.path.realpath(path))
+
+
+def iter_image_files(directory, recursive=False):
+    """Yield the supported image files in directory as they are found.
+
+    Uses os.scandir so nothing is listed up front; on network shares with
+    huge folders the first files are available long before the scan ends.
+    Unreadable folders are skipped.
+    """
+    folders = [directory]
+    while folders:
+        current = folders.pop()
+        subfolders = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                subfolders.append(entry.path)
+                        elif is_supported_image(entry.name) and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        # Depth-first, visiting subfolders in name order
+        folders.extend(sorted(subfolders, reverse=True))
+
+
+def iter_inputs(patterns, recursive=False):
+    """Lazily expand files, directories and glob patterns into image paths"""
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = iter_image_files(pattern, recursive)
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = (
+                path for path in glob.iglob(pattern, recursive=True)
+                if is_supported_image(path) and os.path.isfile(path)
+            )
+        for path in matches:
+            key = path_key(path)
+            if key not in seen:
+                seen.add(key)
+                yield path
+
+
+def expand_inputs(patterns, recursive=False):
+    """Expand files, directories and glob patterns into a list of image paths"""
+    return list(iter_inputs(patterns, recursive))
+
+
+def default_worker_count():
+    """Number of worker processes used when none is configured"""
+    return os.cpu_count() or 1
+
+
+# Output file names; {preset} is 'resized' for a single custom size
+DEFAULT_NAME_TEMPLATE = "{name}_{preset}{ext}"
+
+# Per worker process; bigger images are decoded a band of rows at a time
+DEFAULT_MEMORY_LIMIT_MB = 1024
+
+# Encoder options per profile and output format. Quality is the same in every
+# profile; profiles only trade encoding time against file size.
+ENCODE_PROFILES = {
+    'fast': {
+        'JPEG': {'quality': 95},
+        'PNG': {'compress_level': 1},
+        'WEBP': {'quality': 80, 'method': 0},
+        'AVIF': {'quality': 75, 'speed': 10},
+        'GIF': {},
+    },
+    'balanced': {
+        'JPEG': {'quality': 95, 'optimize': True},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'quality': 80, 'method': 4},
+        'AVIF': {'quality': 75, 'speed': 6},
+        'GIF': {'optimize': True},
+    },
+    'smallest': {
+        'JPEG': {'quality': 95, 'optimize': True, 'progressive': True},
+        'PNG': {'optimize': True},  # Pillow then also uses compress_level 9
+        'WEBP': {'quality': 80, 'method': 6},
+        'AVIF': {'quality': 75, 'speed': 2},
+        'GIF': {'optimize': True},
+    },
+}
+DEFAULT_ENCODE_PROFILE = 'balanced'
+
+# How an image is fitted into the target width × height:
+#   stretch  scale each axis independently (distorts when the aspect differs)
+#   fit      scale to fit inside, keeping the aspect ratio (output may be smaller)
+#   fill     scale to cover and crop the overflow
+#   pad      fit, then center on a canvas of exactly the target size
+FIT_MODES = ('stretch', 'fit', 'fill', 'pad')
+DEFAULT_FIT_MODE = 'stretch'
+
+# What happens to a target that would enlarge the source along either axis:
+#   allow  resample it up like any other size
+#   skip   write no output for it
+#   copy   write the source at its own size instead
+UPSCALE_POLICIES = ('allow', 'skip', 'copy')
+DEFAULT_UPSCALE = 'allow'
+
+# Metadata of the source written to its outputs:
+#   keep   EXIF (with the orientation reset to upright), ICC profile and XMP
+#   icc    only the ICC color profile, so colors still display the same
+#   strip  nothing, for the smallest files
+METADATA_POLICIES = ('keep', 'icc', 'strip')
+DEFAULT_METADATA = 'keep'
+
+# Metadata each output format can store, as Image.save keywords; other
+# formats (GIF, BMP, ...) get none
+METADATA_KEYWORDS = {
+    'JPEG': ('icc_profile', 'exif', 'xmp'),
+    'PNG': ('icc_profile', 'exif'),
+    'WEBP': ('icc_profile', 'exif', 'xmp'),
+    'AVIF': ('icc_profile', 'exif', 'xmp'),
+    'TIFF': ('icc_profile', 'exif'),
+}
+
+# TIFF tags of the source's first IFD that describe how its pixels are stored
+# (size, layout, compression, palette...) rather than the picture. For a TIFF
+# source that IFD is its EXIF; outputs have their own size and mode, so these
+# are never copied. The ICC profile (34675) and XMP (700) have keywords of
+# their own.
+STORAGE_TAGS = frozenset({
+    254, 255, *range(256, 270), 273, 277, 278, 279, 280, 281, 284, 317, 320,
+    *range(322, 326), 330, 338, 339, 340, 341, 347, 513, 514, 700, 34675,
+})
+
+# Metadata encoders copy from the image's own info unless a keyword is given
+# (resized images inherit the source's); None overrides it
+INHERITED_METADATA = ('icc_profile', 'comment')
+
+# Color space sources are resampled in (see linear_light):
+#   standard       8-bit values as stored, by Pillow alone (fastest)
+#   premultiplied  float32 with the colors premultiplied by alpha (images with alpha only)
+#   linear         premultiplied float32 in linear light, so fine detail keeps its brightness
+RESAMPLE_SPACES = ('standard', 'premultiplied', 'linear')
+DEFAULT_RESAMPLE_SPACE = 'standard'
+
+# Transpose turning an image with an EXIF orientation upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Batch pipeline: source files read ahead of the workers and encoded outputs
+# waiting to be written (see BatchResizer), and the threads doing the I/O
+DEFAULT_PREFETCH = 8
+DEFAULT_WRITE_QUEUE = 16
+PREFETCH_THREADS = 4
+WRITER_THREADS = 2
+
+# What BatchResizer does with byte-identical sources: resize each (None), or
+# resize one and hardlink ('link', copying where links fail) or copy its outputs
+DEDUP_MODES = (None, 'link', 'copy')
+
+# Formats images can be converted to: key -> (Pillow format, extension)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+}
+
+
+def available_output_formats():
+    """Keys of OUTPUT_FORMATS the installed Pillow can write"""
+    Image.init()
+    available = []
+    for key, (format_name, _) in OUTPUT_FORMATS.items():
+        if format_name not in Image.SAVE:
+            continue
+        if format_name in ('WEBP', 'AVIF') and not features.check(format_name.lower()):
+            continue
+        available.append(key)
+    return available
+
+
+def available_resample_spaces():
+    """RESAMPLE_SPACES that work here; the float ones need NumPy"""
+    return list(RESAMPLE_SPACES) if HAVE_NUMPY else [DEFAULT_RESAMPLE_SPACE]
+
+
+def format_output_name(template, input_path, target, ext=None, keep_ext=False):
+    """Output file name for input_path at target (preset key, width, height).
+
+    ext replaces the input extension when converting to another format;
+    keep_ext leaves the input extension in the name as well (photo.png_resized.webp).
+    """
+    name, input_ext = os.path.splitext(os.path.basename(input_path))
+    if keep_ext:
+        name += input_ext
+    ext = ext or input_ext
+    preset, width, height = target
+    return template.format(name=name, ext=ext, preset=preset, width=width, height=height)
+
+
+class ResizeSettings:
+    """Options shared by every image of a batch.
+
+    Either a single width and height, or several preset keys that are all
+    produced from one decode of each source image.
+    """
+
+    def __init__(self, width=None, height=None, draft=True, presets=(), name_template=DEFAULT_NAME_TEMPLATE,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, encode_profile=DEFAULT_ENCODE_PROFILE,
+                 output_format=None, fit_mode=DEFAULT_FIT_MODE, smart_crop=False, upscale=DEFAULT_UPSCALE,
+                 metadata=DEFAULT_METADATA, resample_space=DEFAULT_RESAMPLE_SPACE):
+        if presets:
+            self.targets = [(key, PRESETS[key][1], PRESETS[key][2]) for key in presets]
+        else:
+            # A single custom size keeps the classic photo_resized.jpg naming
+            self.targets = [('resized', width, height)]
+        self.name_template = name_template
+        # Let the decoder skip detail the target size cannot show
+        self.draft = draft
+        self.memory_limit_mb = memory_limit_mb
+        self.encode_profile = encode_profile
+        # Key of OUTPUT_FORMATS, or None to keep each input's format
+        self.output_format = output_format
+        self.fit_mode = fit_mode
+        # With 'fill', keep the most detailed part instead of the center
+        self.smart_crop = smart_crop
+        self.upscale = upscale
+        self.metadata = metadata
+        self.resample_space = resample_space
+        self.validate()
+
+    def validate(self):
+        """Raise ValueError for sizes, a name template or a profile that cannot work"""
+        if self.fit_mode not in FIT_MODES:
+            raise ValueError(f"Unknown fit mode {self.fit_mode!r}.")
+        if self.upscale not in UPSCALE_POLICIES:
+            raise ValueError(f"Unknown upscale policy {self.upscale!r}.")
+        if self.metadata not in METADATA_POLICIES:
+            raise ValueError(f"Unknown metadata policy {self.metadata!r}.")
+        if self.resample_space not in RESAMPLE_SPACES:
+            raise ValueError(f"Unknown resample space {self.resample_space!r}.")
+        if self.resample_space != 'standard' and not HAVE_NUMPY:
+            raise ValueError(f"The {self.resample_space!r} resample space needs NumPy, which is not installed.")
+        if self.encode_profile not in ENCODE_PROFILES:
+            raise ValueError(f"Unknown encode profile {self.encode_profile!r}.")
+        if self.output_format is not None and self.output_format not in available_output_formats():
+            raise ValueError(f"Output format {self.output_format!r} is not supported by this Pillow build.")
+        for _, width, height in self.targets:
+            if not width or not height or width <= 0 or height <= 0:
+                raise ValueError("Dimensions must be positive numbers.")
+        try:
+            names = {format_output_name(self.name_template, 'photo.jpg', target) for target in self.targets}
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Invalid name template {self.name_template!r}: {e}")
+        if len(names) < len(self.targets):
+            raise ValueError("The name template must tell the sizes apart, e.g. include {preset}.")
+
+    @property
+    def output_ext(self):
+        """Extension of converted outputs, or None when formats are kept"""
+        return OUTPUT_FORMATS[self.output_format][1] if self.output_format else None
+
+    def key(self):
+        """Stable text identifying the settings, used to detect outdated outputs"""
+        # The memory limit changes how an image is processed, not the result
+        key = {name: value for name, value in vars(self).items() if name != 'memory_limit_mb'}
+        return json.dumps(key, sort_keys=True)
+
+
+def input_subfolder(input_path, roots):
+    """Folder of input_path relative to the first of the scanned folders roots that holds it, or ''"""
+    folder = os.path.dirname(os.path.abspath(input_path))
+    for root in roots:
+        try:
+            relative = os.path.relpath(folder, os.path.abspath(root))
+        except ValueError:
+            continue  # Another drive
+        if relative == os.curdir:
+            return ''
+        if relative != os.pardir and not relative.startswith(os.pardir + os.sep):
+            return relative
+    return ''
+
+
+def output_paths_for(input_path, output_location, settings, single_file=False, roots=(), planned=()):
+    """Work out where the resized copies of input_path are written, one per target.
+
+    Files found in subfolders of the scanned folders roots are written to the
+    same subfolders of output_location, so equal names never meet. When
+    converting formats, photo.jpg and photo.png would share an output; if
+    one of the paths is among planned (absolute paths already taken), the
+    source extension is kept in the names.
+    """
+    if single_file and len(settings.targets) == 1:
+        # Single image, specific file path
+        return (output_location,)
+    if single_file:
+        folder = os.path.dirname(output_location)
+    else:
+        folder = os.path.join(output_location, input_subfolder(input_path, roots))
+    output_paths = tuple(
+        os.path.join(folder, format_output_name(settings.name_template, input_path, target, settings.output_ext))
+        for target in settings.targets
+    )
+    if settings.output_ext and any(os.path.abspath(path) in planned for path in output_paths):
+        output_paths = tuple(
+            os.path.join(folder, format_output_name(settings.name_template, input_path, target,
+                                                    settings.output_ext, keep_ext=True))
+            for target in settings.targets
+        )
+    return output_paths
+
+
+def plan_tasks(input_paths, output_location, settings, roots=()):
+    """Pair each input path with its output paths, lazily.
+
+    roots are the folders the inputs were scanned from (see output_paths_for).
+    Files this plan writes are never picked up as inputs, so streaming a
+    folder scan into the folder being written does not resize the results.
+    """
+    planned_outputs = set()
+    for input_path in input_paths:
+        if os.path.abspath(input_path) in planned_outputs:
+            continue
+        output_paths = output_paths_for(input_path, output_location, settings, roots=roots,
+                                        planned=planned_outputs)
+        planned_outputs.update(os.path.abspath(path) for path in output_paths)
+        yield input_path, output_paths
+
+
+# The decoder draft keeps at least this many source pixels per target pixel
+DRAFT_REDUCING_GAP = 2.0
+# Image.resize first reduces by whole factors down to this gap, then runs Lanczos.
+# Pillow documents 3.0 as visually indistinguishable from a full Lanczos pass.
+RESIZE_REDUCING_GAP = 3.0
+
+
+def apply_draft(img, size, reducing_gap=DRAFT_REDUCING_GAP):
+    """Ask the JPEG decoder for a 1/2, 1/4 or 1/8 scale decode when size is much smaller.
+
+    Must be called before the pixels are loaded; formats without a draft mode
+    are left untouched. Returns the box of the reduced image that covers the
+    original picture (the reduced size is rounded up), or None.
+    """
+    requested = (int(size[0] * reducing_gap), int(size[1] * reducing_gap))
+    if requested[0] >= img.width or requested[1] >= img.height:
+        return None
+    original_size = img.size
+    draft = img.draft(img.mode, requested)
+    if draft is None or img.size == original_size:
+        return None
+    return draft[1]
+
+
+def uses_float(mode, space):
+    """Check whether images of mode are resampled in float32 in space"""
+    if space == 'premultiplied':
+        # Without alpha there is nothing to premultiply and Pillow is as exact
+        return mode in ('LA', 'RGBA')
+    return space == 'linear' and mode in FLOAT_MODES
+
+
+def resample(img, size, box=None, reducing_gap=None, space=DEFAULT_RESAMPLE_SPACE):
+    """Lanczos resample img (or the box region of it) to size in one of RESAMPLE_SPACES.
+
+    Modes the float path cannot take (16-bit, CMYK, ...) use the standard one.
+    """
+    if uses_float(img.mode, space):
+        return resample_float(img, size, box, reducing_gap, linear=space == 'linear')
+    return img.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=reducing_gap)
+
+
+def resample_bytes(size, mode, space=DEFAULT_RESAMPLE_SPACE, output_size=(0, 0)):
+    """Extra memory resample needs for an image of size and mode resampled to output_size in space"""
+    return work_bytes(size, mode, output_size) if uses_float(mode, space) else 0
+
+
+def resize_loaded(img, size, box=None, fast=True, space=DEFAULT_RESAMPLE_SPACE):
+    """Resample an opened image (or the box region of it) to size with high quality"""
+    reducing_gap = RESIZE_REDUCING_GAP if fast else None
+    return resample(img, size, box, reducing_gap, space)
+
+
+def has_alpha(img):
+    """Check whether img has an alpha channel or a transparent palette entry"""
+    return img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or img.has_transparency_data
+
+
+def expand_palette(img):
+    """Convert palette and bilevel images to a mode Lanczos can resample.
+
+    Pillow falls back to nearest-neighbour resizing for 'P' and '1' images,
+    which looks blocky; the palette is rebuilt by the encoder if needed.
+    """
+    if img.mode in ('P', 'PA'):
+        return img.convert('RGBA' if has_alpha(img) else 'RGB')
+    if img.mode == '1':
+        return img.convert('L')
+    return img
+
+
+def flatten_alpha(img, background=(255, 255, 255)):
+    """Composite transparent images onto a solid background"""
+    if img.mode in ('P', 'PA') or (img.mode != 'LA' and has_alpha(img)):
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA'):
+        flattened = Image.new(img.mode[:-1], img.size, background if img.mode == 'RGBA' else background[0])
+        flattened.paste(img, mask=img.getchannel('A'))
+        return flattened
+    return img
+
+
+def prepare_for_format(img, format_name):
+    """Convert img to a mode the encoder for format_name can store"""
+    if format_name == 'JPEG':
+        img = flatten_alpha(img)
+        if img.mode not in ('L', 'RGB', 'CMYK'):
+            img = img.convert('RGB')
+    elif format_name in ('WEBP', 'AVIF'):
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if has_alpha(img) else 'RGB')
+    elif format_name == 'PNG' and img.mode == 'CMYK':
+        img = img.convert('RGB')
+    return img
+
+
+def make_output_dir(output_path):
+    """Ensure the directory output_path is written to exists"""
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+
+
+def output_format(output_path):
+    """Pillow format name for the extension of output_path, or None"""
+    return Image.registered_extensions().get(os.path.splitext(output_path)[1].lower())
+
+
+def encoder_options(output_path, profile=DEFAULT_ENCODE_PROFILE):
+    """Keyword arguments for Image.save of output_path under an encode profile"""
+    return dict(ENCODE_PROFILES[profile].get(output_format(output_path), {}))
+
+
+def save_image(img, output_path, profile=DEFAULT_ENCODE_PROFILE, stats=None, writes=None, metadata=None):
+    """Save with the encoder options of profile for the output format.
+
+    The image is encoded into memory and then written in one go, so stats
+    (see batch_report.new_file_stats) can tell encoding and disk time apart.
+    When writes is a list, the (output_path, data) pair is appended to it
+    for an OutputWriter instead of being written here. metadata holds the
+    Image.save keywords of source_metadata; the ones the format can store
+    are written, and nothing else is carried over from img.
+    Returns (seconds spent encoding and writing, bytes written).
+    """
+    start = time.perf_counter()
+    format_name = output_format(output_path)
+    img = prepare_for_format(img, format_name)
+    options = encoder_options(output_path, profile)
+    options.update(dict.fromkeys(INHERITED_METADATA))
+    options.update((key, value) for key, value in (metadata or {}).items()
+                   if value and key in METADATA_KEYWORDS.get(format_name, ()))
+    buffer = io.BytesIO()
+    img.save(buffer, format=format_name, **options)
+    size = buffer.tell()
+    if stats is not None:
+        stats['bytes_out'] += size
+    if writes is not None:
+        writes.append((output_path, buffer.getvalue()))
+        return add_time(stats, 'encode', start, 'resample') - start, size
+    encoded = add_time(stats, 'encode', start, 'write')
+
+    write_file(output_path, buffer.getbuffer())
+    return add_time(stats, 'write', encoded, 'resample') - start, size
+
+
+def temp_output_path(output_path):
+    """Name to write output_path under before it replaces the real file"""
+    return f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def remove_quietly(path):
+    """Delete path if it exists, ignoring errors"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_file(output_path, data):
+    """Write data to output_path, creating its folder if needed.
+
+    The data goes to a temporary file that then replaces output_path, so a
+    hardlink the old file shares with other outputs (see link_or_copy) is
+    never written through, and a failed write leaves no partial output.
+    """
+    make_output_dir(output_path)
+    temp_path = temp_output_path(output_path)
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+
+
+def copy_file(source, output_path):
+    """Copy source to output_path, replacing it like write_file does"""
+    make_output_dir(output_path)
+    temp_path = temp_output_path(output_path)
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+
+
+def open_source(input_path, data=None):
+    """Open input_path, or its contents already read into data, without the decompression-bomb check"""
+    if data is None:
+        return open_unchecked(input_path)
+    try:
+        return open_unchecked(io.BytesIO(data))
+    except UnidentifiedImageError:
+        # Name the file rather than the in-memory buffer
+        raise UnidentifiedImageError(f"cannot identify image file {input_path!r}") from None
+
+
+def oriented_size(size, orientation):
+    """Size of an image of size once turned upright for its EXIF orientation"""
+    return (size[1], size[0]) if orientation >= 5 else tuple(size)
+
+
+def orient_image(img, orientation):
+    """Turn img upright for its EXIF orientation (a transpose, no resampling)"""
+    if orientation in ORIENTATION_TRANSPOSE:
+        return img.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return img
+
+
+def orient_box(box, size, orientation):
+    """Map box on an image of size onto the same image turned upright for orientation"""
+    width, height = size
+    moves = {
+        2: lambda x, y: (width - x, y),
+        3: lambda x, y: (width - x, height - y),
+        4: lambda x, y: (x, height - y),
+        5: lambda x, y: (y, x),
+        6: lambda x, y: (height - y, x),
+        7: lambda x, y: (height - y, width - x),
+        8: lambda x, y: (y, width - x),
+    }
+    if orientation not in moves:
+        return box
+    (x0, y0), (x1, y1) = moves[orientation](box[0], box[1]), moves[orientation](box[2], box[3])
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+# Orientation that undoes each EXIF orientation
+INVERSE_ORIENTATION = {6: 8, 8: 6}
+
+
+def descriptive_exif(exif):
+    """A new Image.Exif with the tags and Exif/GPS sub-IFDs of exif that describe the picture, or None.
+
+    The storage tags of TIFF sources are left out and the orientation is
+    reset, as outputs are already upright; exif itself is not changed, Pillow
+    may still need it.
+    """
+    if not exif:
+        return None
+    result = Image.Exif()
+    for tag, value in exif.items():
+        if tag in STORAGE_TAGS:
+            continue
+        if tag in (ExifTags.IFD.Exif, ExifTags.IFD.GPSInfo):
+            # Offsets into the source; the sub-IFD itself is copied
+            value = dict(exif.get_ifd(tag))
+            if ExifTags.IFD.Interop in value:
+                value[ExifTags.IFD.Interop] = exif.get_ifd(ExifTags.IFD.Interop)
+            if not value:
+                continue
+        result[tag] = value
+    if ExifTags.Base.Orientation in result:
+        result[ExifTags.Base.Orientation] = 1
+    return result or None
+
+
+def source_metadata(img, policy=DEFAULT_METADATA):
+    """Metadata of an opened source to write to its outputs under policy, as Image.save keywords"""
+    if policy == 'strip':
+        return {}
+    metadata = {'icc_profile': img.info.get('icc_profile')}
+    if policy == 'keep':
+        exif = descriptive_exif(read_exif(img))
+        if exif:
+            metadata['exif'] = exif.tobytes()
+        xmp = img.info.get('xmp')
+        if isinstance(xmp, str):
+            xmp = xmp.encode('utf-8')
+        if xmp:
+            metadata['xmp'] = re.sub(rb'(tiff:Orientation(?:="|>))[0-9]', rb'\g<1>1', xmp)
+    return metadata
+
+
+def plan_fit(source_size, size, mode=DEFAULT_FIT_MODE, anchor=(0.5, 0.5)):
+    """Work out how an image of source_size is fitted into size.
+
+    Returns (box, resized_size, canvas_size): the region of the source to
+    resample, the size it is resampled to, and the size of the final image
+    (bigger than resized_size only for 'pad'). For 'fill', anchor places the
+    crop: (0, 0) keeps the top left, (0.5, 0.5) the center.
+    """
+    source_width, source_height = source_size
+    width, height = size
+    if mode == 'stretch':
+        return (0, 0, source_width, source_height), size, size
+    if mode in ('fit', 'pad'):
+        scale = min(width / source_width, height / source_height)
+        resized = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+        return (0, 0, source_width, source_height), resized, size if mode == 'pad' else resized
+
+    # fill: cover the target and crop the overflow, without copying the source
+    scale = max(width / source_width, height / source_height)
+    crop_width, crop_height = min(source_width, width / scale), min(source_height, height / scale)
+    left = (source_width - crop_width) * anchor[0]
+    top = (source_height - crop_height) * anchor[1]
+    return (left, top, left + crop_width, top + crop_height), size, size
+
+
+def target_action(source_size, plan, upscale=DEFAULT_UPSCALE):
+    """What a plan_fit plan needs: 'resize', 'copy' (the source as it is) or 'skip'.
+
+    A plan that leaves the source size unchanged is a copy; one that enlarges
+    either axis follows the upscale policy.
+    """
+    box, resized_size, canvas_size = plan
+    if box == (0, 0, *source_size) and resized_size == canvas_size == source_size:
+        return 'copy'
+    if upscale != 'allow' and (resized_size[0] > box[2] - box[0] or resized_size[1] > box[3] - box[1]):
+        return upscale
+    return 'resize'
+
+
+def copy_source(input_path, output_path, data=None, stats=None, writes=None):
+    """Write the source file unchanged to output_path (or append it to writes, see save_image)"""
+    start = time.perf_counter()
+    if writes is not None:
+        if data is None:
+            with open(input_path, 'rb') as f:
+                data = f.read()
+        writes.append((output_path, data))
+        size = len(data)
+    elif data is not None:
+        write_file(output_path, data)
+        size = len(data)
+    else:
+        copy_file(input_path, output_path)
+        size = os.path.getsize(output_path)
+    if stats is not None:
+        stats['bytes_out'] += size
+        stats['copied'] += 1
+    add_time(stats, 'write', start)
+
+
+def sampled_size(source_size, plan):
+    """Size the whole source would have at the scale a plan samples it"""
+    box, resized_size, _ = plan
+    return (math.ceil(source_size[0] * resized_size[0] / (box[2] - box[0])),
+            math.ceil(source_size[1] * resized_size[1] / (box[3] - box[1])))
+
+
+def map_box(box, source_size, frame):
+    """Map box in source pixels onto frame, the region of a decoded image showing the whole source"""
+    scale_x = (frame[2] - frame[0]) / source_size[0]
+    scale_y = (frame[3] - frame[1]) / source_size[1]
+    return (frame[0] + box[0] * scale_x, frame[1] + box[1] * scale_y,
+            frame[0] + box[2] * scale_x, frame[1] + box[3] * scale_y)
+
+
+# Longest side of the preview smart cropping looks at
+SMART_CROP_PREVIEW = 256
+
+
+def smart_crop_anchor(img, frame, crop_fraction):
+    """Anchor for plan_fit that puts a crop over the most detailed part of img.
+
+    crop_fraction is the crop size as a fraction of the whole source. Detail
+    is measured as edge strength on a small preview, so this costs little
+    next to the resize itself.
+    """
+    frame_width, frame_height = frame[2] - frame[0], frame[3] - frame[1]
+    scale = SMART_CROP_PREVIEW / max(frame_width, frame_height)
+    preview_size = (max(1, round(frame_width * scale)), max(1, round(frame_height * scale)))
+    preview = img.resize(preview_size, Image.Resampling.BOX, box=frame, reducing_gap=2.0)
+    edges = preview.convert('L').filter(ImageFilter.FIND_EDGES)
+
+    anchor = []
+    for axis, fraction in enumerate(crop_fraction):
+        length = preview_size[axis]
+        window = max(1, round(length * fraction))
+        if window >= length:
+            anchor.append(0.5)
+            continue
+        # Mean edge strength per column (or row), then the best window over it
+        profile = list(edges.resize((length, 1) if axis == 0 else (1, length), Image.Resampling.BOX).tobytes())
+        total = sum(profile[:window])
+        best_total, best_start = total, 0
+        for start in range(1, length - window + 1):
+            total += profile[start + window - 1] - profile[start - 1]
+            if total > best_total:
+                best_total, best_start = total, start
+        anchor.append(best_start / (length - window))
+    return tuple(anchor)
+
+
+def pad_color(img):
+    """Background for padding: transparent when img has alpha, otherwise white"""
+    return 0 if has_alpha(img) else 'white'
+
+
+def pad_to(img, canvas_size):
+    """Center img on a canvas of canvas_size"""
+    if img.size == canvas_size:
+        return img
+    canvas = Image.new(img.mode, canvas_size, pad_color(img))
+    canvas.paste(img, ((canvas_size[0] - img.width) // 2, (canvas_size[1] - img.height) // 2))
+    return canvas
+
+
+def pick_intermediate(intermediates, size):
+    """Smallest already-resized image that still has DRAFT_REDUCING_GAP detail for size"""
+    best = None
+    for candidate in intermediates:
+        if (candidate.width >= size[0] * DRAFT_REDUCING_GAP
+                and candidate.height >= size[1] * DRAFT_REDUCING_GAP
+                and (best is None or candidate.width * candidate.height < best.width * best.height)):
+            best = candidate
+    return best
+
+
+def resize_image(input_path, output_paths, settings, stats=None, data=None, writes=None):
+    """Resize image to every target of settings with high quality, raising on failure.
+
+    output_paths holds one path per target. The source is decoded once; the
+    largest target comes first and smaller targets are resampled from an
+    earlier result instead of the full decode when it is big enough. Crops
+    are passed to the resampler as a box, never copied out first. Sources
+    that do not fit in the memory limit are decoded a band at a time.
+
+    Sizes are planned for the image turned upright by its EXIF orientation,
+    which is applied as a transpose after the draft decode and before
+    resampling. settings.metadata decides what metadata the outputs keep,
+    and settings.resample_space the color space Lanczos runs in.
+
+    Targets the source already matches are copied byte for byte when the
+    format stays the same and all metadata is kept (only encoded otherwise),
+    and targets that would enlarge it follow settings.upscale (see
+    target_action). When no target needs resampling the pixels are never
+    decoded.
+
+    data, if given, is the already read contents of input_path, and writes
+    collects the encoded outputs instead of writing them (see save_image);
+    both let BatchResizer overlap disk access with resampling.
+
+    Returns per-file stats (see batch_report.new_file_stats) with the time
+    spent in each stage and the bytes read and written. Pass in stats to
+    still know the stage that was running when an exception escapes.
+    """
+    if stats is None:
+        stats = new_file_stats()
+    start = time.perf_counter()
+
+    if data is not None:
+        stats['bytes_in'] = len(data)
+    elif not os.path.exists(input_path):
+        # Validate input file exists
+        raise FileNotFoundError(f"Input file does not exist: {input_path}")
+    else:
+        stats['bytes_in'] = os.path.getsize(input_path)
+
+    memory_limit = settings.memory_limit_mb * MB
+    # Whole-image results can feed smaller targets; crops and padding cannot
+    reuse_results = settings.draft and settings.fit_mode in ('stretch', 'fit')
+
+    # Open and resize image; the memory limit stands in for Pillow's
+    # decompression-bomb check, which would refuse large scans outright
+    with open_source(input_path, data) as img:
+        orientation = exif_orientation(img)
+        source_size = oriented_size(img.size, orientation)
+        metadata = source_metadata(img, settings.metadata)
+        plans = [plan_fit(source_size, (w, h), settings.fit_mode) for _, w, h in settings.targets]
+
+        # Unchanged sizes are copied; a copy to another format is encoded without resampling
+        actions = [target_action(source_size, plan, settings.upscale) for plan in plans]
+        copies = []
+        converted = []
+        for index, action in enumerate(actions):
+            if action == 'copy':
+                if output_format(output_paths[index]) == img.format and settings.metadata == 'keep':
+                    copies.append(index)
+                else:
+                    actions[index] = 'resize'
+                    plans[index] = ((0, 0, *source_size), source_size, source_size)
+                    converted.append(index)
+            elif action == 'skip':
+                stats['not_upscaled'] += 1
+                stats['skipped_targets'].append(index)
+        order = sorted((i for i, action in enumerate(actions) if action == 'resize'),
+                       key=lambda i: plans[i][2][0] * plans[i][2][1], reverse=True)
+        if not order:
+            add_time(stats, 'open', start, 'write')
+            for index in copies:
+                copy_source(input_path, output_paths[index], data, stats, writes)
+            return stats
+
+        # One decode serves every target, so draft for the most detailed one
+        sampled = [sampled_size(source_size, plans[index]) for index in order]
+        largest = (max(w for w, _ in sampled), max(h for _, h in sampled))
+        frame = apply_draft(img, oriented_size(largest, orientation)) if settings.draft else None
+        frame = orient_box(frame or (0, 0, img.width, img.height), img.size, orientation)
+        start = add_time(stats, 'open', start, 'decode')
+
+        # Palette images are expanded before resampling
+        work_mode = 'RGBA' if img.mode in ('P', 'PA') else img.mode
+        needed = decoded_bytes(img.size, img.mode) + sum(
+            decoded_bytes(plans[index][2], work_mode) for index in order)
+        if work_mode != img.mode or orientation != 1:
+            needed += decoded_bytes(img.size, work_mode)
+        # Targets are resampled one after the other, so only the largest counts
+        largest_output = max((plans[index][1] for index in order), key=lambda size: size[0] * size[1])
+        needed += resample_bytes(img.size, work_mode, settings.resample_space, largest_output)
+        banded = needed > memory_limit
+        if banded and not can_decode_in_bands(img):
+            raise MemoryError(
+                f"{img.width} × {img.height} image needs {needed // MB} MB to decode, more than the "
+                f"{settings.memory_limit_mb} MB memory limit (only uncompressed images can be "
+                f"processed in strips)")
+
+        if not banded:
+            img.load()
+            expanded = orient_image(expand_palette(img), orientation)
+            start = add_time(stats, 'decode', start, 'resample')
+            if settings.fit_mode == 'fill' and settings.smart_crop:
+                for index in order:
+                    if index in converted:
+                        continue
+                    box = plans[index][0]
+                    _, w, h = settings.targets[index]
+                    plans[index] = plan_fit(source_size, (w, h), 'fill', smart_crop_anchor(
+                        expanded, frame, ((box[2] - box[0]) / source_size[0], (box[3] - box[1]) / source_size[1])))
+
+            intermediates = []
+            for index in order:
+                box, resized_size, canvas_size = plans[index]
+                source = pick_intermediate(intermediates, resized_size) if reuse_results else None
+
+                # Use high-quality resampling
+                if source is None:
+                    img_resized = resize_loaded(expanded, resized_size, box=map_box(box, source_size, frame),
+                                                fast=settings.draft, space=settings.resample_space)
+                else:
+                    img_resized = resize_loaded(source, resized_size, fast=settings.draft,
+                                                space=settings.resample_space)
+                if reuse_results:
+                    intermediates.append(img_resized)
+                img_resized = pad_to(img_resized, canvas_size)
+                add_time(stats, 'resample', start, 'encode')
+
+                save_image(img_resized, output_paths[index], settings.encode_profile, stats, writes, metadata)
+                start = time.perf_counter()
+
+    if banded:
+        resize_in_bands(input_path, output_paths, settings, order, plans, stats, writes, orientation, metadata)
+    for index in copies:
+        stats['stage'] = 'write'
+        copy_source(input_path, output_paths[index], data, stats, writes)
+    return stats
+
+
+def iter_canvas_strips(strips, resized_size, canvas_size):
+    """Turn (top, strip) pieces of a resized image into strips of its padded canvas"""
+    left = (canvas_size[0] - resized_size[0]) // 2
+    top_bar = (canvas_size[1] - resized_size[1]) // 2
+    bottom_bar = canvas_size[1] - resized_size[1] - top_bar
+    bar_rows = None
+    for top, strip in strips:
+        if bar_rows is None:
+            # Bars are emitted in pieces no taller than the strips themselves
+            bar_rows = strip.height
+            for bar_top in range(0, top_bar, bar_rows):
+                yield bar_top, Image.new(strip.mode, (canvas_size[0], min(bar_rows, top_bar - bar_top)),
+                                         pad_color(strip))
+        if canvas_size[0] != resized_size[0]:
+            row = Image.new(strip.mode, (canvas_size[0], strip.height), pad_color(strip))
+            row.paste(strip, (left, 0))
+            strip = row
+        yield top_bar + top, strip
+    for bar_top in range(0, bottom_bar, bar_rows or 1):
+        yield (top_bar + resized_size[1] + bar_top,
+               Image.new(strip.mode, (canvas_size[0], min(bar_rows, bottom_bar - bar_top)), pad_color(strip)))
+
+
+def resize_in_bands(input_path, output_paths, settings, order, plans, stats, writes=None, orientation=1,
+                    metadata=None):
+    """Resize a source too large to decode whole, one band of rows at a time.
+
+    plans holds the plan_fit result of every target, for the source turned
+    upright by orientation; 'fill' crops stay centered because smart
+    cropping would need a full extra pass. Outputs are assembled in memory
+    when they fit in half the memory limit (Pillow's encoders need the whole
+    image) and turned upright once complete; larger PNG outputs of upright
+    sources are written strip by strip instead, without metadata. Stage
+    times and output bytes are added to stats.
+    """
+    with open_unchecked(input_path) as img:
+        stored_size = img.size
+        work_mode = 'RGBA' if img.mode in ('P', 'PA') else img.mode
+    upright_size = oriented_size(stored_size, orientation)
+    memory_limit = settings.memory_limit_mb * MB
+    reuse_results = settings.draft and settings.fit_mode in ('stretch', 'fit')
+    # Bands are resampled in the same color space as whole images
+    band_resample = None
+    band_bytes = 0
+    if settings.resample_space != 'standard':
+        band_resample = functools.partial(resample, space=settings.resample_space)
+        if uses_float(work_mode, settings.resample_space):
+            band_bytes = source_pixel_bytes(work_mode)
+    intermediates = []
+    for index in order:
+        box, resized_size, canvas_size = plans[index]
+        output_path = output_paths[index]
+
+        source = pick_intermediate(intermediates, resized_size) if reuse_results else None
+        if source is not None:
+            start = time.perf_counter()
+            img_resized = resize_loaded(source, resized_size, fast=settings.draft, space=settings.resample_space)
+            intermediates.append(img_resized)
+            img_resized = pad_to(img_resized, canvas_size)
+            add_time(stats, 'resample', start, 'encode')
+            save_image(img_resized, output_path, settings.encode_profile, stats, writes, metadata)
+            continue
+
+        # Bands are read as stored, so the box and size are mapped back from upright
+        stored_box = orient_box(box, upright_size, INVERSE_ORIENTATION.get(orientation, orientation))
+        stored_resized_size = oriented_size(resized_size, orientation)
+        held = sum(decoded_bytes(img.size, img.mode) for img in intermediates)
+        stats['stage'] = 'decode'
+        output_bytes = decoded_bytes(canvas_size, 'RGBA') * (1 if orientation == 1 else 2)
+        if held + output_bytes <= memory_limit // 2:
+            img_resized = None
+            for top, strip in iter_resized_strips(input_path, stored_resized_size,
+                                                  memory_limit - held - output_bytes,
+                                                  prepare=expand_palette, box=stored_box, timings=stats,
+                                                  resample=band_resample, resample_pixel_bytes=band_bytes):
+                if img_resized is None:
+                    img_resized = Image.new(strip.mode, stored_resized_size)
+                img_resized.paste(strip, (0, top))
+            img_resized = orient_image(img_resized, orientation)
+            if reuse_results:
+                intermediates.append(img_resized)
+            save_image(pad_to(img_resized, canvas_size), output_path, settings.encode_profile, stats, writes,
+                       metadata)
+        elif output_format(output_path) == 'PNG' and orientation == 1:
+            strips = iter_resized_strips(input_path, resized_size, memory_limit - held,
+                                         prepare=expand_palette, box=box, timings=stats,
+                                         resample=band_resample, resample_pixel_bytes=band_bytes)
+            write_png_in_strips(iter_canvas_strips(strips, resized_size, canvas_size),
+                                output_path, canvas_size, settings.encode_profile, stats)
+        else:
+            raise MemoryError(
+                f"A {canvas_size[0]} × {canvas_size[1]} output does not fit in the {settings.memory_limit_mb} MB "
+                f"memory limit; save it as PNG to have it written in strips"
+                + (" (only possible for upright sources)" if orientation != 1 else ""))
+
+
+def write_png_in_strips(strips, output_path, size, profile=DEFAULT_ENCODE_PROFILE, stats=None):
+    """Write (top, strip) pieces of an image of size to a PNG as they arrive.
+
+    Compression and writing are interleaved, so stats count both as 'encode'.
+    The PNG replaces output_path once complete (see write_file).
+    Returns (seconds spent encoding and writing, bytes written).
+    """
+    make_output_dir(output_path)
+    options = encoder_options(output_path, profile)
+    compress_level = options.get('compress_level', 9 if options.get('optimize') else 6)
+    encode_seconds = 0.0
+    temp_path = temp_output_path(output_path)
+    writer = None
+    try:
+        for _, strip in strips:
+            start = time.perf_counter()
+            if writer is None:
+                writer = PNGStripWriter(temp_path, size, strip.mode, compress_level)
+            writer.write(strip)
+            encode_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        writer.close()
+        writer = None
+        os.replace(temp_path, output_path)
+        encode_seconds += time.perf_counter() - start
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        remove_quietly(temp_path)
+        raise
+    size = os.path.getsize(output_path)
+    if stats is not None:
+        stats['encode'] += encode_seconds
+        stats['bytes_out'] += size
+    return encode_seconds, size
+
+
+class FileError(namedtuple('FileError', 'path stage error_type message')):
+    """A file that could not be resized.
+
+    stage is the entry of batch_report.STAGES that was running, 'worker'
+    when the worker process itself died, 'probe' when the header check
+    refused the file before resizing, or 'plan' when an earlier file of the
+    batch writes the same output; error_type is the exception class.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.message} (during {self.stage})"
+
+
+def _resize_task(input_path, output_paths, settings, data=None, defer_writes=False):
+    """Worker entry point: resize one file, returning the error instead of raising.
+
+    Returns (input_path, error, stats, writes): on success error is None and
+    stats are the per-file stats of resize_image plus the worker's peak
+    memory so far ('peak_rss'); on failure error is a FileError and stats is
+    None. With defer_writes, writes holds the encoded (output_path, data)
+    pairs still to be written; otherwise it is empty.
+    """
+    stats = new_file_stats()
+    writes = [] if defer_writes else None
+    try:
+        resize_image(input_path, output_paths, settings, stats, data, writes)
+    except PermissionError as e:
+        message = f"Cannot write to {e.filename or output_paths[0]}: {e}"
+        return input_path, FileError(input_path, stats['stage'], type(e).__name__, message), None, ()
+    except Exception as e:
+        return input_path, FileError(input_path, stats['stage'], type(e).__name__, str(e) or repr(e)), None, ()
+    del stats['stage']
+    stats['peak_rss'] = peak_rss_bytes()
+    return input_path, None, stats, writes or ()
+
+
+def file_digest(path):
+    """Content hash of a source file for deduplication, or None when it cannot be read"""
+    try:
+        return file_sha256(path)
+    except OSError:
+        return None
+
+
+class ReadBudget:
+    """Bytes of source data a batch may hold for its workers at once, shared by the read threads"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, count):
+        """Take count bytes from the budget; False (and nothing taken) when they do not fit"""
+        with self._lock:
+            if self.used + count > self.limit:
+                return False
+            self.used += count
+            return True
+
+    def release(self, count):
+        """Give back bytes taken with reserve"""
+        with self._lock:
+            self.used -= count
+
+
+def read_source(input_path, max_bytes, budget=None):
+    """Read a source file for a worker, returning (data, seconds).
+
+    data is None when the file is bigger than max_bytes, does not fit in
+    what is left of budget (a ReadBudget) or cannot be read; the worker then
+    opens it itself (and reports any error). The bytes of data stay taken
+    from budget until the caller releases them.
+    """
+    start = time.perf_counter()
+    try:
+        size = os.path.getsize(input_path)
+        if size > max_bytes or (budget is not None and not budget.reserve(size)):
+            return None, 0.0
+    except OSError:
+        return None, 0.0
+    try:
+        with open(input_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        data = None
+    if budget is not None:
+        # The file may have changed since it was measured
+        budget.release(size - (len(data) if data is not None else 0))
+    return data, (time.perf_counter() - start if data is not None else 0.0)
+
+
+class OutputWriter:
+    """Write encoded outputs on background threads, fed through a bounded queue.
+
+    Items are the batch's QueuedFiles (only input_path is used here).
+
+    put() blocks while depth files are waiting, which holds back the batch
+    and so bounds the memory used by outputs not yet on disk. Each written
+    file is reported as (item, write seconds, error) by get_done().
+    """
+
+    def __init__(self, depth, threads=2):
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self.done = queue.Queue()
+        self.outstanding = 0  # Items put but not yet taken back with get_done()
+        self._threads = [threading.Thread(target=self._write, name=f'output-writer-{i}', daemon=True)
+                         for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item, writes):
+        """Queue the (output_path, data) pairs of item for writing"""
+        self.outstanding += 1
+        self._queue.put((item, writes))
+
+    def get_done(self, timeout=None):
+        """Next (item, write seconds, error) that was written; raises queue.Empty if there is none yet"""
+        entry = self.done.get(block=timeout is not None, timeout=timeout)
+        self.outstanding -= 1
+        return entry
+
+    def _write(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            item, writes = entry
+            start = time.perf_counter()
+            error = None
+            for output_path, data in writes:
+                try:
+                    write_file(output_path, data)
+                except PermissionError as e:
+                    error = FileError(item.input_path, 'write', type(e).__name__,
+                                      f"Cannot write to {output_path}: {e}")
+                except Exception as e:
+                    # Any failure must be reported, or the batch would wait for it forever
+                    error = FileError(item.input_path, 'write', type(e).__name__, str(e) or repr(e))
+                if error is not None:
+                    break
+            self.done.put((item, time.perf_counter() - start, error))
+
+    def close(self):
+        """Finish the queued writes and stop the threads"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class TaskFeed:
+    """Pull items from an iterable on a background thread through a bounded queue.
+
+    Lets a slow producer, such as a directory scan on a network share, run
+    ahead of the consumer without blocking it or buffering everything.
+    """
+
+    DONE = object()  # Returned by get() once the iterable is exhausted
+
+    def __init__(self, iterable, max_pending=256):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._produce, args=(iterable,), name='task-feed', daemon=True)
+        self._thread.start()
+
+    def _produce(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put((None, item)):
+                    return
+            self._put((None, self.DONE))
+        except Exception as e:
+            self._put((e, None))
+
+    def _put(self, entry):
+        """Queue entry, giving up once the feed is closed"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(entry, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, block=True, timeout=None):
+        """Return the next item or DONE; raises queue.Empty when nothing is ready"""
+        error, item = self._queue.get(block, timeout)
+        if error is not None:
+            raise error
+        return item
+
+    def close(self):
+        """Stop the producer thread"""
+        self._closed.set()
+
+
+class BatchResult:
+    """Outcome of a batch run"""
+
+    def __init__(self, total, encode_profile=DEFAULT_ENCODE_PROFILE, targets=1):
+        self.total = total  # None while a streamed input is still being read
+        self.encode_profile = encode_profile
+        self.targets = targets  # Outputs per source
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)  # Summed over workers, so can exceed the wall time
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_rss = None  # Highest peak memory of any worker process, in bytes
+        self.wall_seconds = 0.0
+        self.workers = None  # Worker processes the pool was started with
+        self.probe_seconds = None  # Time spent reading headers to plan the batch, when probed
+        self.files = []  # Per-file records: path, error and the stats of each resized file
+        self.deduplicated = 0  # Identical copies whose outputs were linked or copied, not resized
+        self.dedup_saved_seconds = 0.0  # Worker time the resized original took for each such copy
+        self.dedup_saved_bytes = 0  # Source bytes that were not decoded again
+        self.copied = 0  # Outputs written as unchanged copies of their source
+        self.not_upscaled = 0  # Targets left out by the upscale policy
+        self.successful = 0
+        self.skipped = 0  # Already up to date in the manifest
+        self.not_written = 0  # Resized without error, but every target was left out by the upscale policy
+        self.failed = []  # FileError of each file that could not be resized
+        self.cancelled = False
+        self.error = None  # Set when the batch itself could not run
+
+    @property
+    def processed(self):
+        return self.successful + self.skipped + self.not_written + len(self.failed)
+
+    @property
+    def encode_seconds(self):
+        """Time spent encoding and writing outputs, summed over workers"""
+        return self.stage_seconds['encode'] + self.stage_seconds['write']
+
+    @property
+    def images_per_second(self):
+        return self.successful / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def add_file(self, input_path, error, stats):
+        """Record the outcome of one resized file"""
+        record = {'path': input_path, 'error': None}
+        if error is None:
+            self._count_done(stats)
+            for stage in STAGES:
+                self.stage_seconds[stage] += stats[stage]
+            self.bytes_read += stats['bytes_in']
+            self.bytes_written += stats['bytes_out']
+            self.copied += stats['copied']
+            self.not_upscaled += stats['not_upscaled']
+            if stats.get('peak_rss') is not None:
+                self.peak_rss = max(self.peak_rss or 0, stats['peak_rss'])
+            record.update(stats)
+        else:
+            self.failed.append(error)
+            record.update(error=error.message, stage=error.stage, error_type=error.error_type)
+        self.files.append(record)
+
+    def add_duplicate(self, input_path, original_path, original_stats):
+        """Record a file whose outputs were taken from an identical, already resized file"""
+        self._count_done(original_stats)
+        self.deduplicated += 1
+        self.dedup_saved_seconds += sum(original_stats[stage] for stage in STAGES)
+        self.dedup_saved_bytes += original_stats['bytes_in']
+        self.files.append({'path': input_path, 'error': None, 'duplicate_of': original_path})
+
+    def _count_done(self, stats):
+        if len(stats['skipped_targets']) == self.targets:
+            self.not_written += 1
+        else:
+            self.successful += 1
+
+
+class QueuedFile:
+    """A task on its way through the BatchResizer pipeline"""
+
+    __slots__ = ('input_path', 'output_paths', 'fingerprint', 'read', 'data_bytes', 'size', 'digest',
+                 'original', 'duplicates', 'stats', 'state')
+
+    def __init__(self, input_path, output_paths, fingerprint=None):
+        self.input_path = input_path
+        self.output_paths = output_paths
+        self.fingerprint = fingerprint
+        self.read = None  # Future of read_source while prefetching
+        self.data_bytes = 0  # Prefetched bytes handed to the worker, until it finishes
+        self.size = None  # Source size in bytes, when deduplicating
+        self.digest = None  # Future of the content hash, when another source has the same size
+        self.original = None  # Identical earlier file whose outputs this one shares
+        self.duplicates = []  # Identical files waiting for this one's outputs
+        self.stats = None
+        self.state = 'queued'  # Then 'done' or 'failed'
+
+
+def link_or_copy(source, destination, mode='link'):
+    """Make destination a hardlink to source (or a copy, as fallback or when mode is 'copy').
+
+    Returns 'link' or 'copy', whichever was done. An existing destination is
+    replaced.
+    """
+    make_output_dir(destination)
+    if mode == 'link':
+        temp_path = f"{destination}.{os.getpid()}.link"
+        try:
+            os.link(source, temp_path)
+            os.replace(temp_path, destination)
+            return 'link'
+        except OSError:
+            # Other file system, or one without hardlinks
+            remove_quietly(temp_path)
+    copy_file(source, destination)
+    return 'copy'
+
+
+class BatchResizer:
+    """Resize a batch of images on a process pool.
+
+    tasks is an iterable of (input_path, output_paths) pairs, all resized
+    with the same ResizeSettings (one output path per target). It may be a
+    lazy generator (e.g. a directory scan), in which case resizing starts
+    before the scan is finished and the total is reported as None until the
+    input is exhausted.
+
+    Disk access overlaps with the CPU work: up to prefetch source files are
+    read ahead on threads, and the workers hand encoded outputs back to an
+    OutputWriter holding at most write_queue files. Either depth can be 0
+    to let the workers read or write the files themselves. Source data read
+    ahead, including files handed to workers that have not finished yet,
+    stays within the memory limit in total; files over a quarter of it, or
+    that do not fit in what is left, are left to the workers to read.
+
+    With dedup set to 'link' or 'copy', sources are grouped by size and
+    hashed when another source has the same size; a byte-identical copy of
+    a file already in the batch is not resized again, its outputs are
+    hardlinked (or copied) from the first one's once those are written.
+
+    With probe=True the header of every source is read first (see
+    image_probe; probe_cache keeps the results for later runs): the largest
+    images are resized first so the batch does not end on one long file,
+    decompression bombs fail with the 'probe' stage without being decoded,
+    and the pool gets no more workers than the free memory can hold. The
+    whole input is read before the batch starts, so a lazy scan must finish
+    first.
+
+    Progress is posted to progress_queue as ('progress', done, total,
+    input_path, error) messages (error is None or a FileError), followed by
+    a single ('finished', result) message once the batch is done or
+    cancelled. Failures never stop the batch. With a BatchManifest,
+    outputs that are already up to date are skipped and reported as
+    ('skipped', done, total, input_path) messages.
+    """
+
+    def __init__(self, tasks, settings, workers=None, progress_queue=None, manifest=None,
+                 prefetch=DEFAULT_PREFETCH, write_queue=DEFAULT_WRITE_QUEUE, dedup=None, probe=False,
+                 probe_cache=None):
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode {dedup!r}.")
+        self.tasks = tasks
+        self.settings = settings
+        self.manifest = manifest
+        self.workers = max(1, workers or default_worker_count())
+        self.prefetch = max(0, prefetch)
+        self.write_queue = max(0, write_queue)
+        self.dedup = dedup
+        self.probe = probe
+        self.probe_cache = probe_cache
+        self.progress_queue = progress_queue if progress_queue is not None else queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Run the batch on a background thread"""
+        self._thread = threading.Thread(target=self.run, name='batch-resize', daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop submitting work; files already being resized are finished"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        """Process every task and return a BatchResult"""
+        result = BatchResult(len(self.tasks) if hasattr(self.tasks, '__len__') else None,
+                             self.settings.encode_profile, len(self.settings.targets))
+        started = time.perf_counter()
+        feed = None
+        exhausted = False
+        submitted = 0
+        reading = deque()  # QueuedFiles not yet handed to a worker, in input order
+        pending = set()
+        jobs = {}  # future -> QueuedFile
+        sizes = {}  # source size -> QueuedFiles of that size, when deduplicating
+        claimed = {}  # output path -> input path writing it
+        settings_key = self.settings.key()
+        max_prefetch_bytes = self.settings.memory_limit_mb * MB // 4
+        # Tasks waiting in the pool's queues keep their data until a worker finishes them
+        read_budget = ReadBudget(self.settings.memory_limit_mb * MB)
+        reader = None
+        if self.prefetch or self.dedup:
+            reader = ThreadPoolExecutor(PREFETCH_THREADS, thread_name_prefix='prefetch')
+        writer = OutputWriter(self.write_queue, WRITER_THREADS) if self.write_queue else None
+
+        try:
+            tasks = self.tasks
+            workers = self.workers
+            if self.probe:
+                tasks, rejected, workers = self._plan(result)
+                for error in rejected:
+                    submitted += 1
+                    result.add_file(error.path, error, None)
+                    self.progress_queue.put(('progress', result.processed, result.total, error.path, error))
+            result.workers = workers
+            feed = TaskFeed(tasks)
+
+            # Spawned workers never inherit the GUI's threads or Tk state
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                while True:
+                    if writer is not None:
+                        self._report_written(writer, result, settings_key, reading)
+
+                    # Read sources ahead of the workers
+                    while not self.cancelled and not exhausted and len(reading) < max(self.prefetch, 1):
+                        try:
+                            # Only wait for the input when there is nothing else to do
+                            task = feed.get(block=not pending and not reading, timeout=0.2)
+                        except queue.Empty:
+                            break
+                        if task is TaskFeed.DONE:
+                            exhausted = True
+                            result.total = submitted
+                            break
+                        item = QueuedFile(*task)
+                        submitted += 1
+
+                        error = self._claim_outputs(item, claimed)
+                        if error is not None:
+                            result.add_file(item.input_path, error, None)
+                            self.progress_queue.put(
+                                ('progress', result.processed, result.total, item.input_path, error))
+                            continue
+
+                        if self.manifest is not None:
+                            try:
+                                item.fingerprint = self.manifest.fingerprint(item.input_path)
+                                if all(self.manifest.is_current(item.input_path, output_path, settings_key,
+                                                                item.fingerprint)
+                                       for output_path in item.output_paths):
+                                    result.skipped += 1
+                                    self.progress_queue.put(
+                                        ('skipped', result.processed, result.total, item.input_path))
+                                    continue
+                            except OSError:
+                                # Let the worker report the missing or unreadable file
+                                item.fingerprint = None
+
+                        if self.dedup:
+                            self._queue_hashes(item, sizes, reader)
+                        if self.prefetch:
+                            item.read = reader.submit(read_source, item.input_path, max_prefetch_bytes,
+                                                      read_budget)
+                        reading.append(item)
+
+                    # Keep only a few tasks in flight so cancelling takes effect quickly
+                    while not self.cancelled and reading and len(pending) < workers * 2:
+                        item = reading[0]
+                        blocking = self._blocking_future(item, sizes)
+                        if blocking is not None:
+                            break
+                        reading.popleft()
+
+                        original = self._find_original(item, sizes)
+                        if original is not None:
+                            # Resized once; the outputs are shared once the original's are written
+                            self._discard_read(item, read_budget)
+                            item.original = original
+                            if original.state == 'done':
+                                self._share_outputs(result, settings_key, original, item)
+                            else:
+                                original.duplicates.append(item)
+                            continue
+
+                        data, read_seconds = item.read.result() if item.read is not None else (None, 0.0)
+                        item.read = read_seconds
+                        item.data_bytes = len(data) if data is not None else 0
+                        future = executor.submit(_resize_task, item.input_path, item.output_paths, self.settings,
+                                                 data, writer is not None)
+                        del data
+                        jobs[future] = item
+                        pending.add(future)
+
+                    if self.cancelled:
+                        for item in reading:
+                            self._discard_read(item, read_budget)
+                            if isinstance(item.digest, Future):
+                                item.digest.cancel()
+                        reading.clear()
+                    if not pending and not reading:
+                        if writer is not None and writer.outstanding:
+                            # Only writes left; their files may still requeue identical copies
+                            self._report_written(writer, result, settings_key, reading, timeout=0.2)
+                            continue
+                        if exhausted or self.cancelled:
+                            break
+                        continue
+
+                    waiting = set(pending)
+                    if reading and len(pending) < workers * 2:
+                        blocking = self._blocking_future(reading[0], sizes)
+                        if blocking is not None:
+                            waiting.add(blocking)
+                    finished, _ = wait(waiting, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        if future not in jobs:
+                            continue  # A prefetch read or hash; its task is submitted on the next pass
+                        pending.discard(future)
+                        item = jobs.pop(future)
+                        read_budget.release(item.data_bytes)
+                        if future.cancelled():
+                            continue
+                        try:
+                            _, error, stats, writes = future.result()
+                        except Exception as e:
+                            # The worker process itself died
+                            error = FileError(item.input_path, 'worker', type(e).__name__, str(e) or repr(e))
+                            stats, writes = None, ()
+
+                        if stats is not None:
+                            stats['open'] += item.read
+                        item.stats = stats
+                        if writes:
+                            # Blocks while the writer is full, holding back new work
+                            writer.put(item, writes)
+                        else:
+                            self._file_done(result, settings_key, item, error, reading)
+
+                    if self.cancelled:
+                        for future in list(pending):
+                            if future.cancel():
+                                pending.discard(future)
+                                read_budget.release(jobs.pop(future).data_bytes)
+        except Exception as e:
+            # Never leave the caller waiting for a 'finished' message
+            result.error = str(e)
+        finally:
+            if feed is not None:
+                feed.close()
+            if reader is not None:
+                reader.shutdown(wait=False, cancel_futures=True)
+            if writer is not None:
+                writer.close()
+                self._report_written(writer, result, settings_key, None)
+            if self.manifest is not None:
+                self.manifest.save()
+            if result.total is None:
+                result.total = submitted
+            result.cancelled = self.cancelled
+            result.wall_seconds = time.perf_counter() - started
+            self.progress_queue.put(('finished', result))
+        return result
+
+    @staticmethod
+    def _discard_read(item, budget):
+        """Drop the prefetch of a file that is not handed to a worker, giving its bytes back"""
+        if isinstance(item.read, Future) and not item.read.cancel():
+            data, _ = item.read.result()
+            if data is not None:
+                budget.release(len(data))
+        item.read = None
+
+    @staticmethod
+    def _claim_outputs(item, claimed):
+        """Reserve the outputs of item, or return a FileError when an earlier file writes one of them"""
+        keys = [os.path.normcase(os.path.abspath(path)) for path in item.output_paths]
+        for key, output_path in zip(keys, item.output_paths):
+            if key in claimed:
+                return FileError(item.input_path, 'plan', 'FileExistsError',
+                                 f"{output_path} is already written for {claimed[key]}")
+        claimed.update(dict.fromkeys(keys, item.input_path))
+        return None
+
+    def _plan(self, result):
+        """Probe every source: returns the tasks largest first, FileErrors of the rejected ones and the worker count"""
+        start = time.perf_counter()
+        tasks = list(self.tasks)
+        infos = probe_images([input_path for input_path, _ in tasks], self.probe_cache)
+        if self.probe_cache is not None:
+            self.probe_cache.save()
+
+        planned = []
+        rejected = []
+        for input_path, output_paths in tasks:
+            info = infos[input_path]
+            if info is not None and info.is_bomb():
+                rejected.append(FileError(
+                    input_path, 'probe', 'DecompressionBombError',
+                    f"{info.width} × {info.height} image would decode to {info.decoded_bytes // MB} MB "
+                    f"from a {max(1, info.file_size // 1024)} KB file"))
+            else:
+                planned.append((input_path, output_paths))
+        # Unreadable files sort last; the workers report them
+        planned.sort(key=lambda task: -infos[task[0]].decoded_bytes if infos[task[0]] is not None else 0)
+
+        result.total = len(tasks)
+        result.probe_seconds = time.perf_counter() - start
+        memory_limit = self.settings.memory_limit_mb * MB
+        workers = suggest_workers([infos[input_path] for input_path, _ in planned], memory_limit, self.workers)
+        return planned, rejected, workers
+
+    def _queue_hashes(self, item, sizes, reader):
+        """Hash item, and the earlier files of the same size, once two sources share a size"""
+        try:
+            item.size = os.path.getsize(item.input_path)
+        except OSError:
+            return  # Reported by the worker
+        same_size = sizes.setdefault(item.size, [])
+        if same_size:
+            for other in same_size + [item]:
+                if other.digest is None:
+                    other.digest = reader.submit(file_digest, other.input_path)
+        same_size.append(item)
+
+    def _blocking_future(self, item, sizes):
+        """Read or hash that must finish before item can be handed to a worker, or None"""
+        if isinstance(item.read, Future) and not item.read.done():
+            return item.read
+        if item.digest is not None:
+            # Earlier files of the same size decide whether item is a copy
+            for other in sizes[item.size]:
+                if other.digest is not None and not other.digest.done():
+                    return other.digest
+                if other is item:
+                    break
+        return None
+
+    def _find_original(self, item, sizes):
+        """Earlier file of the batch with the same contents that is (or was) resized, or None"""
+        if item.digest is None or item.digest.result() is None:
+            return None
+        for other in sizes[item.size]:
+            if other is item:
+                return None
+            if (other.digest is not None and other.original is None and other.state != 'failed'
+                    and other.digest.result() == item.digest.result()):
+                return other
+        return None
+
+    def _report_written(self, writer, result, settings_key, reading, timeout=None):
+        """Complete the files whose outputs the writer has finished"""
+        while True:
+            try:
+                item, seconds, error = writer.get_done(timeout)
+            except queue.Empty:
+                return
+            timeout = None
+            item.stats['write'] += seconds
+            if error is not None:
+                item.stats = None
+            self._file_done(result, settings_key, item, error, reading)
+
+    def _file_done(self, result, settings_key, item, error, reading):
+        """Record a finished file and its identical copies, update the manifest and report progress"""
+        item.state = 'done' if error is None else 'failed'
+        result.add_file(item.input_path, error, item.stats)
+        self._record_outputs(settings_key, item, error)
+        self.progress_queue.put(('progress', result.processed, result.total, item.input_path, error))
+
+        for duplicate in item.duplicates:
+            if error is None:
+                self._share_outputs(result, settings_key, item, duplicate)
+            elif reading is not None and not self.cancelled:
+                # The original failed: resize the copy on its own instead
+                duplicate.original = None
+                duplicate.digest = None
+                reading.appendleft(duplicate)
+            else:
+                duplicate_error = FileError(duplicate.input_path, error.stage, error.error_type,
+                                            f"Identical to {item.input_path}, which failed: {error.message}")
+                duplicate.state = 'failed'
+                result.add_file(duplicate.input_path, duplicate_error, None)
+                self.progress_queue.put(
+                    ('progress', result.processed, result.total, duplicate.input_path, duplicate_error))
+        item.duplicates = []
+
+    def _share_outputs(self, result, settings_key, original, duplicate):
+        """Give duplicate the outputs already written for the identical file original"""
+        error = None
+        try:
+            for index, (source, destination) in enumerate(zip(original.output_paths, duplicate.output_paths)):
+                if index in original.stats['skipped_targets']:
+                    continue  # Left out by the upscale policy
+                link_or_copy(source, destination, self.dedup)
+        except OSError as e:
+            error = FileError(duplicate.input_path, 'write', type(e).__name__, str(e))
+            result.add_file(duplicate.input_path, error, None)
+        else:
+            result.add_duplicate(duplicate.input_path, original.input_path, original.stats)
+        duplicate.state = 'done' if error is None else 'failed'
+        self._record_outputs(settings_key, duplicate, error)
+        self.progress_queue.put(('progress', result.processed, result.total, duplicate.input_path, error))
+
+    def _record_outputs(self, settings_key, item, error):
+        """Remember the outputs of a finished file in the manifest"""
+        if error is None and item.fingerprint is not None:
+            stats = item.original.stats if item.original is not None else item.stats
+            for index, (output_path, (_, width, height)) in enumerate(zip(item.output_paths, self.settings.targets)):
+                self.manifest.record(item.input_path, output_path, settings_key, item.fingerprint, (width, height),
+                                     skipped=index in stats['skipped_targets'])
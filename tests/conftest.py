@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# The modules live at the top of the repository, next to image_resizer.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resize_cli import main  # noqa: E402
+
+
+@pytest.fixture
+def run_cli():
+    """Run the command line quietly on inputs into output_folder; returns its exit code"""
+    def run(inputs, output_folder, *options):
+        return main([*map(str, inputs), '-o', str(output_folder), '-q', *options])
+    return run
+
+
+@pytest.fixture
+def color_of():
+    """Color of the top left pixel of an image file, as '#rrggbb'"""
+    def color_of(path):
+        with Image.open(path) as img:
+            return '#%02x%02x%02x' % img.convert('RGB').getpixel((0, 0))
+    return color_of
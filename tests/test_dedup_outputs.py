@@ -0,0 +1,33 @@
+"""
+Outputs shared by --dedup link must stay independent when one of them is
+written again.
+"""
+import os
+
+import pytest
+from PIL import Image
+
+
+# A smaller size is resampled and encoded, the source size is copied as it is;
+# write_queue 0 lets the worker write the outputs itself
+@pytest.mark.parametrize('size', [(32, 24), (64, 48)], ids=['resized', 'copied'])
+@pytest.mark.parametrize('write_queue', [0, 16], ids=['worker', 'writer'])
+def test_rerun_of_one_duplicate_keeps_the_other_output(tmp_path, run_cli, color_of, size, write_queue):
+    options = ('--width', str(size[0]), '--height', str(size[1]), '--dedup', 'link',
+               '--write-queue', str(write_queue), '--jobs', '1')
+    inputs = tmp_path / 'in'
+    inputs.mkdir()
+    Image.new('RGB', (64, 48), '#ff0000').save(inputs / 'x.png')
+    Image.new('RGB', (64, 48), '#ff0000').save(inputs / 'y.png')
+    output_folder = tmp_path / 'out'
+    assert run_cli([inputs], output_folder, *options) == 0
+    x_output = output_folder / 'x_resized.png'
+    y_output = output_folder / 'y_resized.png'
+    assert color_of(x_output) == color_of(y_output) == '#ff0000'
+
+    Image.new('RGB', (64, 48), '#0000ff').save(inputs / 'y.png')
+    assert run_cli([inputs / 'y.png'], output_folder, *options) == 0
+
+    assert color_of(y_output) == '#0000ff'
+    assert color_of(x_output) == '#ff0000'
+    assert not os.path.samefile(x_output, y_output)
@@ -0,0 +1,80 @@
+"""
+The metadata policy decides what every output format carries over from the
+source, including formats it cannot write metadata to.
+"""
+import pytest
+from PIL import ExifTags, Image, ImageCms
+
+from resize_engine import ResizeSettings, resize_image
+
+TIFF_ICC_PROFILE = 34675
+MAKE = 0x010F
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.jpg'
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera maker'
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    Image.new('RGB', (64, 48), (200, 100, 50)).save(path, exif=exif, icc_profile=icc_profile, comment=b'note')
+    return path
+
+
+def resize_to(source, extension, policy, size=(32, 24)):
+    output_path = source.with_name(f'out{extension}')
+    resize_image(str(source), [str(output_path)], ResizeSettings(*size, metadata=policy))
+    return Image.open(output_path)
+
+
+@pytest.mark.parametrize('extension', ['.jpg', '.png', '.webp', '.tif', '.gif', '.bmp'])
+def test_strip_leaves_no_metadata(source, extension):
+    with resize_to(source, extension, 'strip') as img:
+        assert not img.info.get('icc_profile')
+        assert not img.info.get('comment')
+        assert MAKE not in img.getexif()
+        if extension == '.tif':
+            assert TIFF_ICC_PROFILE not in img.tag_v2
+
+
+def test_tiff_keeps_exif_and_icc_profile(source):
+    with resize_to(source, '.tif', 'keep') as img:
+        assert img.info.get('icc_profile')
+        assert img.getexif()[MAKE] == 'Camera maker'
+
+
+def test_tiff_icc_policy_drops_exif(source):
+    with resize_to(source, '.tif', 'icc') as img:
+        assert img.info.get('icc_profile')
+        assert MAKE not in img.getexif()
+
+
+def tiff_source(path, mode):
+    img = Image.new('RGB', (64, 48), (200, 100, 50))
+    if mode == 'P':
+        img = img.quantize(16)
+    elif mode == 'RGBA':
+        img.putalpha(128)
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera maker'
+    exif[ExifTags.Base.Orientation] = 1
+    exif[ExifTags.IFD.Exif] = {ExifTags.Base.DateTimeOriginal: '2024:05:01 12:00:00'}
+    img.save(path, exif=exif.tobytes())
+    return path
+
+
+# A TIFF source's EXIF is its whole first IFD, size and strip layout included
+@pytest.mark.parametrize('size', [(40, 30), (100, 70)], ids=['smaller', 'larger'])
+@pytest.mark.parametrize('mode', ['RGB', 'P', 'RGBA'])
+@pytest.mark.parametrize('extension', ['.tif', '.jpg'])
+def test_tiff_source_keeps_only_descriptive_exif(tmp_path, extension, mode, size):
+    source = tiff_source(tmp_path / 'source.tif', mode)
+    with resize_to(source, extension, 'keep', size) as img:
+        img.load()
+        assert img.size == size
+        exif = img.getexif()
+        assert exif[MAKE] == 'Camera maker'
+        assert exif.get_ifd(ExifTags.IFD.Exif)[ExifTags.Base.DateTimeOriginal] == '2024:05:01 12:00:00'
+        if extension == '.jpg':
+            assert ExifTags.Base.StripOffsets not in exif
+            assert ExifTags.Base.ImageWidth not in exif
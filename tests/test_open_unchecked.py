@@ -0,0 +1,24 @@
+"""
+Opening without the decompression-bomb check never leaves the check off.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from large_image import open_unchecked
+
+
+def test_concurrent_opens_restore_the_pixel_limit(tmp_path):
+    limit = Image.MAX_IMAGE_PIXELS
+    paths = []
+    for index in range(20):
+        path = tmp_path / f'{index}.png'
+        Image.new('RGB', (8, 8)).save(path)
+        paths.append(path)
+
+    def open_and_close(path):
+        open_unchecked(path).close()
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(open_and_close, paths * 50))
+    assert Image.MAX_IMAGE_PIXELS == limit
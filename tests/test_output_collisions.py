@@ -0,0 +1,43 @@
+"""
+Every output path is written for one source only.
+"""
+from PIL import Image
+
+SIZE = ('--width', '16', '--height', '12')
+
+
+def test_recursive_scan_keeps_subfolders(tmp_path, run_cli, color_of):
+    inputs = tmp_path / 'in'
+    for folder, color in (('a', '#ff0000'), ('b', '#0000ff')):
+        (inputs / folder).mkdir(parents=True)
+        Image.new('RGB', (32, 24), color).save(inputs / folder / 'x.png')
+    output_folder = tmp_path / 'out'
+    assert run_cli([inputs], output_folder, *SIZE, '--recursive') == 0
+
+    assert color_of(output_folder / 'a' / 'x_resized.png') == '#ff0000'
+    assert color_of(output_folder / 'b' / 'x_resized.png') == '#0000ff'
+    assert not (output_folder / 'x_resized.png').exists()
+
+
+def test_second_source_of_an_output_fails(tmp_path, capsys, run_cli):
+    for folder in ('a', 'b'):
+        (tmp_path / folder).mkdir()
+        Image.new('RGB', (32, 24)).save(tmp_path / folder / 'x.png')
+    output_folder = tmp_path / 'out'
+    assert run_cli([tmp_path / 'a' / 'x.png', tmp_path / 'b' / 'x.png'], output_folder, *SIZE) == 1
+
+    captured = capsys.readouterr()
+    assert 'Resized 1/2' in captured.out
+    assert 'Failed: 1 images (1 during plan)' in captured.err
+
+
+def test_converted_sources_with_the_same_name_keep_their_extension(tmp_path, run_cli, color_of):
+    inputs = tmp_path / 'in'
+    inputs.mkdir()
+    Image.new('RGB', (32, 24), '#ff0000').save(inputs / 'a.bmp')
+    Image.new('RGB', (32, 24), '#0000ff').save(inputs / 'a.png')
+    output_folder = tmp_path / 'out'
+    assert run_cli([inputs / 'a.bmp', inputs / 'a.png'], output_folder, *SIZE, '--format', 'png') == 0
+
+    assert color_of(output_folder / 'a_resized.png') == '#ff0000'
+    assert color_of(output_folder / 'a.png_resized.png') == '#0000ff'
@@ -0,0 +1,35 @@
+"""
+Sources smaller than a target under --upscale skip get no output for it, and
+that decision is remembered and shared like a written output.
+"""
+from PIL import Image
+
+SKIP_UPSCALES = ('--width', '64', '--height', '48', '--upscale', 'skip', '--jobs', '1')
+
+
+def test_incremental_rerun_skips_source_without_output(tmp_path, capsys, run_cli):
+    source = tmp_path / 'small.png'
+    Image.new('RGB', (32, 24), '#ff0000').save(source)
+    output_folder = tmp_path / 'out'
+    assert run_cli([source], output_folder, *SKIP_UPSCALES, '--incremental') == 0
+    assert 'Resized 0/1' in capsys.readouterr().out
+    assert not (output_folder / 'small_resized.png').exists()
+
+    assert run_cli([source], output_folder, *SKIP_UPSCALES, '--incremental') == 0
+    assert 'Skipped 1 images that were already up to date' in capsys.readouterr().out
+
+
+def test_duplicate_does_not_share_stale_output(tmp_path, run_cli, color_of):
+    inputs = tmp_path / 'in'
+    inputs.mkdir()
+    Image.new('RGB', (128, 96), '#ff0000').save(inputs / 'x.png')
+    Image.new('RGB', (128, 96), '#0000ff').save(inputs / 'y.png')
+    output_folder = tmp_path / 'out'
+    assert run_cli([inputs], output_folder, *SKIP_UPSCALES) == 0
+
+    # Now identical and smaller than the target: the outputs are left from the first run
+    Image.new('RGB', (32, 24), '#ff0000').save(inputs / 'x.png')
+    Image.new('RGB', (32, 24), '#ff0000').save(inputs / 'y.png')
+    assert run_cli([inputs], output_folder, *SKIP_UPSCALES, '--dedup', 'link') == 0
+    assert color_of(output_folder / 'x_resized.png') == '#ff0000'
+    assert color_of(output_folder / 'y_resized.png') == '#0000ff'
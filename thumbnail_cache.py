@@ -0,0 +1,208 @@
+"""
+Thumbnail cache for the preview grid.
+
+Thumbnails are keyed by (path, mtime, file size, thumbnail size), so an entry
+is reused until the file changes. They are shown upright, following the
+EXIF orientation like the resized outputs. Recently used thumbnails are kept in memory
+up to a byte budget (least recently used first out) and can also be stored as
+small PNGs under the user cache directory so they survive restarts.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from image_probe import exif_orientation
+from resize_engine import flatten_alpha, orient_image
+
+# Bumped when thumbnails are rendered differently, so stale disk entries are not reused
+THUMBNAIL_VERSION = 2
+
+
+def user_cache_dir(app_name='ImageResizerPro'):
+    """Per-user cache directory for the application"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, app_name)
+
+
+def render_thumbnail(image_path, size=(120, 120)):
+    """Decode image_path into a fixed-size RGB thumbnail on a dark background"""
+    with Image.open(image_path) as img:
+        # Let JPEGs decode at 1/2 to 1/8 scale; a thumbnail never needs more
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        img = orient_image(img, exif_orientation(img))
+
+        # Convert to RGB, flattening transparency onto white
+        img = flatten_alpha(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # Create thumbnail maintaining aspect ratio
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+
+        # Create a new image with fixed size and center the thumbnail
+        thumb = Image.new('RGB', size, (45, 45, 45))  # Dark background
+        x = (size[0] - img.width) // 2
+        y = (size[1] - img.height) // 2
+        thumb.paste(img, (x, y))
+
+        return thumb
+
+
+def image_bytes(img):
+    """Approximate memory used by the pixels of img"""
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailCache:
+    """LRU thumbnail cache with a memory byte budget and optional disk storage"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> image, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if disk_dir:
+            try:
+                os.makedirs(disk_dir, exist_ok=True)
+                self.disk_dir = disk_dir
+                self.prune_disk()
+            except OSError:
+                # Fall back to a memory-only cache
+                self.disk_dir = None
+
+    @staticmethod
+    def make_key(image_path, size):
+        """Cache key for image_path at the given thumbnail size"""
+        stat = os.stat(image_path)
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, tuple(size), THUMBNAIL_VERSION)
+
+    def get(self, key, disk=True):
+        """Return the cached thumbnail for key, or None.
+
+        With disk=False only the memory cache is checked, which never blocks
+        on file I/O.
+        """
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img
+
+        if not disk:
+            return None
+        img = self._load_from_disk(key)
+        with self._lock:
+            if img is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, img)
+        return img
+
+    def put(self, key, img):
+        """Add a thumbnail to the cache"""
+        with self._lock:
+            self._store(key, img)
+        self._save_to_disk(key, img)
+
+    def get_or_create(self, image_path, size=(120, 120)):
+        """Return the thumbnail for image_path, rendering and caching it on a miss"""
+        key = self.make_key(image_path, size)
+        img = self.get(key)
+        if img is None:
+            img = render_thumbnail(image_path, size)
+            self.put(key, img)
+        return img
+
+    def clear(self):
+        """Drop every in-memory thumbnail"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def _store(self, key, img):
+        """Insert into the LRU and evict down to the byte budget (lock held)"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= image_bytes(old)
+        self._entries[key] = img
+        self._bytes += image_bytes(img)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= image_bytes(evicted)
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], digest + '.png')
+
+    def _load_from_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img
+        except (OSError, ValueError):
+            return None
+
+    def _save_to_disk(self, key, img):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            img.save(temp_path, format='PNG', compress_level=1)
+            os.replace(temp_path, path)
+        except OSError:
+            # The disk cache is only an optimisation
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def prune_disk(self):
+        """Delete the least recently written disk entries beyond max_disk_bytes"""
+        if self.disk_dir is None:
+            return
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, file_size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= file_size
+            except OSError:
+                pass
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for building preview PhotoImages from PIL thumbnails.
+
+Compares the old PNG + base64 round-trip through tk.PhotoImage(data=...)
+with the direct pixel copy of ImageTk.PhotoImage that the preview grid uses
+now, and prints previews per second for each. Needs a display for Tk.
+
+    python tools/bench_previews.py --count 500
+"""
+import argparse
+import base64
+import io
+import sys
+import time
+import tkinter as tk
+
+from PIL import Image, ImageTk
+
+
+def png_base64_photo(root, thumbnail):
+    """Previous path: encode to PNG, base64 it and let Tk decode it again"""
+    img_bytes = io.BytesIO()
+    thumbnail.save(img_bytes, format='PNG')
+    return tk.PhotoImage(master=root, data=base64.b64encode(img_bytes.getvalue()))
+
+
+def direct_photo(root, thumbnail):
+    """Current path: copy the pixels straight into the Tk photo"""
+    return ImageTk.PhotoImage(thumbnail, master=root)
+
+
+def make_thumbnails(count, size=(120, 120)):
+    """Photo-like RGB thumbnails; noise keeps PNG from compressing them for free"""
+    thumbnails = []
+    for i in range(count):
+        noise = Image.effect_noise(size, 20 + i % 40).convert('L')
+        gradient = Image.linear_gradient('L').resize(size)
+        thumbnails.append(Image.merge('RGB', (noise, gradient, noise.rotate(90))))
+    return thumbnails
+
+
+def bench(root, build, thumbnails):
+    """Build a PhotoImage per thumbnail and return previews per second"""
+    start = time.perf_counter()
+    photos = [build(root, thumbnail) for thumbnail in thumbnails]
+    root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    del photos
+    return len(thumbnails) / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=500, help="previews per run (default: 500)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per method, best is kept")
+    args = parser.parse_args(argv)
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Tk is not available: {e}", file=sys.stderr)
+        return 1
+    root.withdraw()
+
+    thumbnails = make_thumbnails(args.count)
+    results = {}
+    for name, build in (("PNG + base64 (before)", png_base64_photo), ("ImageTk direct (after)", direct_photo)):
+        results[name] = max(bench(root, build, thumbnails) for _ in range(args.repeat))
+        print(f"{name:<24} {results[name]:>10.0f} previews/s")
+
+    before, after = results.values()
+    print(f"Speed-up: {after / before:.1f}x")
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
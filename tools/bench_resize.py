@@ -0,0 +1,196 @@
+"""
+Benchmark the resize engine on a reproducible synthetic corpus.
+
+Generates images in several sizes, formats (JPEG, PNG, WebP, TIFF) and modes
+(RGB, RGBA, P) from a fixed seed, then resizes the whole corpus to each
+built-in preset with each worker count through BatchResizer, the same
+resize_image path the GUI and command line use. Prints throughput and the
+per-image latency percentiles for every run.
+
+    python tools/bench_resize.py                            # default corpus
+    python tools/bench_resize.py --workers 1,4,8 --json baseline.json
+    python tools/bench_resize.py --corpus bench_corpus/     # keep and reuse the images
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from batch_report import STAGES  # noqa: E402
+from resize_engine import (  # noqa: E402
+    DEFAULT_PREFETCH,
+    DEFAULT_WRITE_QUEUE,
+    PRESETS,
+    BatchResizer,
+    ResizeSettings,
+    default_worker_count,
+    plan_tasks,
+)
+
+FORMATS = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp', 'tiff': '.tif'}
+MODES = ('RGB', 'RGBA', 'P')
+# Modes each format can store without a conversion
+FORMAT_MODES = {'jpeg': ('RGB',), 'webp': ('RGB', 'RGBA')}
+PERCENTILES = (50, 90, 99)
+
+
+def parse_size(value):
+    """argparse type for WIDTHxHEIGHT"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT: {value!r}")
+    return width, height
+
+
+def comma_list(kind, choices=None):
+    """argparse type for a comma separated list of kind"""
+    def parse(value):
+        items = [kind(item) for item in value.split(',') if item]
+        if choices is not None:
+            for item in items:
+                if item not in choices:
+                    raise argparse.ArgumentTypeError(f"{item!r} is not one of {', '.join(choices)}")
+        return items
+    return parse
+
+
+def make_image(size, mode, rng):
+    """Photo-like image with smooth areas and fine detail, fully determined by rng"""
+    coarse = (max(1, size[0] // 4), max(1, size[1] // 4))
+    noise = Image.frombytes('L', coarse, rng.randbytes(coarse[0] * coarse[1])).resize(size, Image.Resampling.BICUBIC)
+    gradient = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    mandel = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64)
+    img = Image.merge('RGB', (
+        ImageChops.add(gradient, noise, scale=2.0),
+        mandel,
+        ImageChops.add(radial, noise, scale=2.0),
+    ))
+    if mode == 'RGBA':
+        img.putalpha(ImageChops.invert(radial))
+    elif mode == 'P':
+        img = img.quantize(256)
+    return img
+
+
+def build_corpus(folder, sizes, formats, modes, copies, seed):
+    """Write the corpus to folder, reusing files that are already there; returns their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for width, height in sizes:
+        for mode in modes:
+            for copy in range(copies):
+                img = None
+                for format_key in formats:
+                    if mode not in FORMAT_MODES.get(format_key, MODES):
+                        continue
+                    path = os.path.join(folder, f"{width}x{height}_{mode}_{copy}{FORMATS[format_key]}")
+                    paths.append(path)
+                    if os.path.exists(path):
+                        continue
+                    if img is None:
+                        img = make_image((width, height), mode, random.Random(rng.random()))
+                    options = {'quality': 90} if format_key in ('jpeg', 'webp') else {}
+                    img.save(path, **options)
+    return paths
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_batch(paths, preset, workers, output_folder, prefetch=DEFAULT_PREFETCH, write_queue=DEFAULT_WRITE_QUEUE):
+    """Resize paths to preset with workers processes; returns the BatchResult"""
+    settings = ResizeSettings(presets=[preset])
+    batch = BatchResizer(plan_tasks(paths, output_folder, settings), settings, workers=workers,
+                         prefetch=prefetch, write_queue=write_queue)
+    return batch.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=comma_list(parse_size), default=[(1600, 1200), (4000, 3000)],
+                        help="source sizes, comma separated (default: 1600x1200,4000x3000)")
+    parser.add_argument('--formats', type=comma_list(str, FORMATS), default=list(FORMATS),
+                        help="source formats (default: jpeg,png,webp,tiff)")
+    parser.add_argument('--modes', type=comma_list(str, MODES), default=list(MODES),
+                        help="source modes (default: RGB,RGBA,P; JPEG is RGB only, WebP has no P)")
+    parser.add_argument('--copies', type=int, default=2, help="images per size, mode and format")
+    parser.add_argument('--presets', type=comma_list(str, PRESETS), default=list(PRESETS),
+                        help="presets to resize to (default: all)")
+    parser.add_argument('--workers', type=comma_list(int), default=sorted({1, default_worker_count()}),
+                        help="worker counts to run with (default: 1 and the number of CPU cores)")
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help="files read ahead of the workers, 0 to turn off (default: %(default)s)")
+    parser.add_argument('--write-queue', type=int, default=DEFAULT_WRITE_QUEUE,
+                        help="outputs waiting for the writer, 0 to turn off (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per combination, the fastest is kept")
+    parser.add_argument('--seed', type=int, default=1, help="corpus seed (default: 1)")
+    parser.add_argument('--corpus', help="folder to keep the corpus in (default: a temporary folder)")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = args.corpus or os.path.join(temp_dir, 'corpus')
+        os.makedirs(corpus, exist_ok=True)
+        start = time.perf_counter()
+        paths = build_corpus(corpus, args.sizes, args.formats, args.modes, args.copies, args.seed)
+        megapixels = sum(width * height for width, height in args.sizes) / 1e6 * len(paths) / len(args.sizes)
+        print(f"Corpus: {len(paths)} images, {megapixels:.0f} MP in {corpus} "
+              f"({time.perf_counter() - start:.1f} s to prepare)")
+
+        print(f"{'preset':<10} {'workers':>7} {'images/s':>9} {'MP/s':>7} "
+              + " ".join(f"{'p' + str(p) + ' ms':>9}" for p in PERCENTILES) + "  slowest stage")
+        results = []
+        for preset in args.presets:
+            for workers in args.workers:
+                best = None
+                for run in range(args.repeat):
+                    output_folder = os.path.join(temp_dir, f"out_{preset}_{workers}_{run}")
+                    result = run_batch(paths, preset, workers, output_folder, args.prefetch, args.write_queue)
+                    if result.error is not None or result.failed:
+                        print(f"{preset} with {workers} workers failed: "
+                              f"{result.error or result.failed[0]}", file=sys.stderr)
+                        return 1
+                    if best is None or result.wall_seconds < best.wall_seconds:
+                        best = result
+
+                latencies = sorted(sum(record[stage] for stage in STAGES) for record in best.files)
+                slowest = max(STAGES, key=best.stage_seconds.get)
+                row = {
+                    'preset': preset,
+                    'workers': workers,
+                    'images': best.successful,
+                    'wall_seconds': round(best.wall_seconds, 4),
+                    'images_per_second': round(best.images_per_second, 2),
+                    'megapixels_per_second': round(megapixels / best.wall_seconds, 2),
+                    'latency_ms': {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in PERCENTILES},
+                    'stage_seconds': {stage: round(seconds, 4) for stage, seconds in best.stage_seconds.items()},
+                    'peak_rss': best.peak_rss,
+                }
+                results.append(row)
+                print(f"{preset:<10} {workers:>7} {row['images_per_second']:>9.1f} "
+                      f"{row['megapixels_per_second']:>7.1f} "
+                      + " ".join(f"{row['latency_ms'][f'p{p}']:>9.1f}" for p in PERCENTILES)
+                      + f"  {slowest} ({best.stage_seconds[slowest] * 100 / sum(best.stage_seconds.values()):.0f}%)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': args.seed, 'images': len(paths), 'runs': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
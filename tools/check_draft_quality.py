@@ -0,0 +1,93 @@
+"""
+Check that the fast draft-decode resize path stays visually equivalent to a
+full-resolution Lanczos resize.
+
+Each image is resized twice, once with the draft decode and reducing gap the
+engine uses by default and once at full resolution, and the PSNR between the
+two results is reported. The script exits with status 1 when any image falls
+below the threshold.
+
+    python tools/check_draft_quality.py                     # synthetic 24 MP JPEG
+    python tools/check_draft_quality.py photos/*.jpg --preset hero
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageChops, ImageStat
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resize_engine import PRESETS, apply_draft, resize_loaded  # noqa: E402
+
+
+def psnr(first, second):
+    """Peak signal-to-noise ratio between two same-sized images, in dB"""
+    diff = ImageChops.difference(first.convert('RGB'), second.convert('RGB'))
+    mse = sum(ImageStat.Stat(diff).sum2) / (first.width * first.height * 3)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+def make_sample_jpeg(path, size=(6000, 4000)):
+    """Write a photo-like synthetic JPEG with fine detail and smooth gradients"""
+    noise = Image.effect_noise(size, 40).convert('L')
+    gradient = Image.linear_gradient('L').resize(size)
+    radial = Image.radial_gradient('L').resize(size)
+    mandel = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100)
+    img = Image.merge('RGB', (
+        ImageChops.add(gradient, noise, scale=2.0),
+        mandel,
+        ImageChops.add(radial, noise, scale=2.0),
+    ))
+    img.save(path, quality=92)
+
+
+def resize_file(path, size, draft):
+    """Resize path to size the way the engine does, returning image and seconds"""
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        box = apply_draft(img, size) if draft else None
+        resized = resize_loaded(img, size, box=box, fast=draft)
+    return resized, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('images', nargs='*', help="images to check (default: synthetic 24 MP JPEG)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='product')
+    parser.add_argument('--min-psnr', type=float, default=35.0,
+                        help="lowest acceptable PSNR in dB (default: 35)")
+    args = parser.parse_args(argv)
+
+    _, width, height = PRESETS[args.preset]
+    images = args.images
+    temp_dir = None
+    if not images:
+        temp_dir = tempfile.TemporaryDirectory()
+        sample = os.path.join(temp_dir.name, 'sample_24mp.jpg')
+        make_sample_jpeg(sample)
+        images = [sample]
+
+    failed = 0
+    for path in images:
+        reference, full_time = resize_file(path, (width, height), draft=False)
+        fast, fast_time = resize_file(path, (width, height), draft=True)
+        score = psnr(reference, fast)
+        ok = score >= args.min_psnr
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {os.path.basename(path)} -> {width}x{height}: "
+              f"PSNR {score:.1f} dB, full {full_time * 1000:.0f} ms, "
+              f"draft {fast_time * 1000:.0f} ms ({full_time / fast_time:.1f}x)")
+
+    if temp_dir is not None:
+        temp_dir.cleanup()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
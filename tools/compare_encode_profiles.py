@@ -0,0 +1,66 @@
+"""
+Compare the encode profiles of the resize engine: time and file size per
+profile and output format.
+
+Each image is resized once to the chosen preset and then saved with every
+profile as JPEG, PNG and WebP, so the numbers only reflect the encoder.
+
+    python tools/compare_encode_profiles.py                 # synthetic photo
+    python tools/compare_encode_profiles.py photos/*.jpg --preset hero
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resize_engine import ENCODE_PROFILES, PRESETS, resize_loaded, save_image  # noqa: E402
+from check_draft_quality import make_sample_jpeg  # noqa: E402
+
+FORMATS = ('.jpg', '.png', '.webp')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('images', nargs='*', help="images to encode (default: synthetic photo)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='hero')
+    parser.add_argument('--repeat', type=int, default=3, help="saves per profile, best time is kept")
+    args = parser.parse_args(argv)
+
+    _, width, height = PRESETS[args.preset]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = args.images
+        if not images:
+            sample = os.path.join(temp_dir, 'sample.jpg')
+            make_sample_jpeg(sample, size=(3000, 2000))
+            images = [sample]
+
+        resized = []
+        for path in images:
+            with Image.open(path) as img:
+                resized.append(resize_loaded(img.convert('RGB'), (width, height)))
+
+        print(f"{len(resized)} images at {width}x{height}")
+        print(f"{'format':<6} {'profile':<10} {'ms/image':>9} {'KB/image':>9}")
+        for ext in FORMATS:
+            output_path = os.path.join(temp_dir, 'out' + ext)
+            for profile in ENCODE_PROFILES:
+                best = None
+                for _ in range(args.repeat):
+                    seconds = 0.0
+                    size = 0
+                    for img in resized:
+                        elapsed, written = save_image(img, output_path, profile)
+                        seconds += elapsed
+                        size += written
+                    best = seconds if best is None else min(best, seconds)
+                print(f"{ext[1:]:<6} {profile:<10} {best * 1000 / len(resized):>9.1f} "
+                      f"{size / 1024 / len(resized):>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Compare the resample spaces of the resize engine: time per source megapixel
+for each space, mode and preset.
+
+Images are decoded once and held in memory, so the numbers only reflect the
+resampler (including the NumPy conversions of the float spaces).
+
+    python tools/compare_resample_spaces.py                 # synthetic RGB and RGBA images
+    python tools/compare_resample_spaces.py logos/*.png --preset product
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from resize_engine import PRESETS, available_resample_spaces, expand_palette, resize_loaded  # noqa: E402
+from bench_resize import make_image  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('images', nargs='*', help="images to resample (default: synthetic 4000x3000 RGB and RGBA)")
+    parser.add_argument('--preset', choices=sorted(PRESETS), action='append', dest='presets',
+                        help="preset to resample to; repeat for several (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per space, best time is kept")
+    args = parser.parse_args(argv)
+
+    if args.images:
+        sources = []
+        for path in args.images:
+            with Image.open(path) as img:
+                sources.append((os.path.basename(path), expand_palette(img)))
+    else:
+        rng = random.Random(1)
+        sources = [('synthetic', make_image((4000, 3000), mode, rng)) for mode in ('RGB', 'RGBA')]
+
+    spaces = available_resample_spaces()
+    if len(spaces) == 1:
+        print("NumPy is not installed; only the standard space is available", file=sys.stderr)
+
+    print(f"{'image':<16} {'mode':<5} {'preset':<10} {'space':<14} {'ms/MP':>8} {'vs standard':>12}")
+    for name, img in sources:
+        megapixels = img.width * img.height / 1e6
+        for preset in args.presets or list(PRESETS):
+            _, width, height = PRESETS[preset]
+            baseline = None
+            for space in spaces:
+                best = None
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    resize_loaded(img, (width, height), space=space)
+                    seconds = time.perf_counter() - start
+                    best = seconds if best is None else min(best, seconds)
+                baseline = baseline or best
+                print(f"{name[:16]:<16} {img.mode:<5} {preset:<10} {space:<14} "
+                      f"{best * 1000 / megapixels:>8.1f} {best / baseline:>11.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())